@@ -5,6 +5,7 @@ Main application entry point
 import os
 from flask import Flask
 from utils.logger import setup_logger
+from utils.json_provider import OrjsonProvider
 from config import Config, config
 from routes.health_routes import health_bp
 from routes.webhook_routes import webhook_bp
@@ -40,6 +41,9 @@ def create_app(config_name=None):
     # Create Flask app
     app = Flask(__name__)
     
+    # Use orjson for request.get_json() and jsonify()
+    app.json = OrjsonProvider(app)
+    
     # Initialize Flask-Sock for WebSocket support
     sock.init_app(app)
     
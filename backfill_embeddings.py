@@ -72,8 +72,8 @@ def update_embedding(row_id: str, vec: List[float]):
         raise RuntimeError(resp.error.message)
 
 def count_missing():
-    """Count how many rows are missing embeddings"""
-    resp = sb.table("intent_example").select("id", count="exact").is_("embedding", "null").execute()
+    """Count how many rows are missing embeddings (HEAD request: only the count comes back, no rows)"""
+    resp = sb.table("intent_example").select("id", count="exact", head=True).is_("embedding", "null").execute()
     if getattr(resp, "error", None):
         raise RuntimeError(resp.error.message)
     return resp.count or 0
@@ -47,6 +47,8 @@ class Config:
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
     APP_BASE_URL = os.getenv('APP_BASE_URL', 'https://siftly.onrender.com')
+    # Reject /voice-webhook requests without a valid X-Twilio-Signature (off until enabled per deployment)
+    TWILIO_VALIDATE_SIGNATURES = os.getenv('TWILIO_VALIDATE_SIGNATURES', 'False').lower() == 'true'
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -8,25 +8,30 @@ if os.getenv('RENDER'):
     if os.getenv('RENDER_PLAN') == 'free':
         # Free tier - conservative settings
         workers = 2  # Reduced from 4 to fit in 512MB
+        threads = 8  # Webhooks are I/O-bound; threads are cheaper than workers
         worker_connections = 100  # Reduced connection pool
         timeout = 30  # Shorter timeout
     elif os.getenv('RENDER_PLAN') == 'starter':
         # Starter plan ($7/month) - 512MB RAM, 0.5 CPU
         workers = 2  # Respect 0.5 CPU limit (2 workers × 0.25 CPU each)
+        threads = 16  # Overlap Supabase/Retell/Twilio round-trips within a worker
         worker_connections = 200  # Moderate connection pool
         timeout = 45  # Balanced timeout
     else:
         # Standard+ plans - more resources available
         workers = 4
+        threads = 32
         worker_connections = 500
         timeout = 60
 else:
     # Local development
     cpu_count = multiprocessing.cpu_count()
     workers = min(cpu_count * 2 + 1, 8)
+    threads = 8
 
-# Worker class - use sync workers (reliable and compatible)
-worker_class = 'sync'
+# Worker class - threaded workers so a handler blocked on Supabase/Retell/Twilio
+# I/O (or a long-lived /transcription/stream WebSocket) doesn't pin a whole process
+worker_class = 'gthread'
 
 # Maximum requests per worker before restart
 max_requests = 1000
@@ -3,10 +3,12 @@ import os, re, json, time, uuid as uuidlib
 from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify
-from supabase import create_client, Client
 from openai import OpenAI
+from postgrest.types import ReturnMethod
 from config import Config
+from utils.cache import TTLCache
 from utils.intents import get_general_question_intent_id
+from utils.supabase_client import get_supabase_client
 
 # --- Blueprint dedicated to this feature ---
 classify_bp = Blueprint("classify_bp", __name__)
@@ -21,21 +23,23 @@ TOP_K = int(os.getenv("TOP_K", "5"))
 GENERAL_ACTION_POLICY = os.getenv("GENERAL_ACTION_POLICY", "answer_from_kb")
 GENERAL_CATEGORY_NAME = os.getenv("GENERAL_CATEGORY_NAME", "knowledge_base")
 KB_SCORE_THRESH = float(os.getenv("KB_SCORE_THRESH", "0.70"))
+KB_TOP_K = int(os.getenv("KB_TOP_K", "1"))  # only the best KB row is used for the answer
 
-# small thread pool for parallel KB lookup
-_kb_pool = ThreadPoolExecutor(max_workers=4)
+# small thread pool for overlapping the independent network calls (translations, KB lookup)
+_io_pool = ThreadPoolExecutor(max_workers=8)
+
+# separate executor for the fire-and-forget call_reason_log inserts, so a backlog of
+# slow writes never delays the translations / KB lookups a live request waits on
+_log_pool = ThreadPoolExecutor(max_workers=2)
+
+# curated clarifier questions by intent pair (most pairs have none, so None is cached too)
+_clarifier_cache = TTLCache(ttl_seconds=300, maxsize=4096)
+_MISSING = object()
 
 # --- Clients (lazy initialization) ---
-_supabase_client = None
 _emb_client = None
 _or_client = None
 
-def get_supabase_client() -> Client:
-    global _supabase_client
-    if _supabase_client is None:
-        _supabase_client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
-    return _supabase_client
-
 def get_emb_client() -> OpenAI:
     global _emb_client
     if _emb_client is None:
@@ -83,11 +87,13 @@ def saw_cta_yes(conversation: str) -> bool:
     return False
 
 def bubble_sales_candidates_first(candidates: list[dict]) -> list[dict]:
-    """Stable-sort: intents with sales-y names/descriptions go first."""
-    def is_salesy(c):
+    """Stable partition in one pass: intents with sales-y names/descriptions go first,
+    each group keeps its similarity order."""
+    salesy, rest = [], []
+    for c in candidates:
         s = (c.get("name","") + " " + c.get("description",""))
-        return bool(SALES_INTENT_RE.search(s))
-    return sorted(candidates, key=lambda c: (not is_salesy(c), c.get("name","")))
+        (salesy if SALES_INTENT_RE.search(s) else rest).append(c)
+    return salesy + rest
 
 def generate_cta_bridge(kb_title: str, kb_content: str, target_language: str | None) -> str:
     """
@@ -168,13 +174,18 @@ def generate_acknowledgment(utterance: str, intent_name: str, action_policy: str
         }
         return fallbacks.get(action_policy, "I understand this is important to you.")
 
+ROLE_LINE_RE = re.compile(r"^(User|Caller|Customer|Agent|System)\s*[:\-]\s*(.*)$", re.I)
+
+def _stripped_lines(conversation: str) -> list[str]:
+    # strip each line once, dropping the blank ones
+    return [l for l in map(str.strip, conversation.splitlines()) if l]
+
 def _normalize_convo_lines(conversation: str) -> list[tuple[str, str]]:
     if not conversation:
         return []
-    lines = [l.strip() for l in conversation.splitlines() if l.strip()]
     out: list[tuple[str, str]] = []
-    for l in lines:
-        m = re.match(r"^(User|Caller|Customer|Agent|System)\s*[:\-]\s*(.*)$", l, flags=re.I)
+    for l in _stripped_lines(conversation):
+        m = ROLE_LINE_RE.match(l)
         if m:
             role = m.group(1).lower()
             text = (m.group(2) or "").strip()
@@ -190,15 +201,12 @@ def _extract_user_context(conversation: str, max_lines: int = 50) -> str:
     """
     if not conversation:
         return ""
-    lines = [l.strip() for l in conversation.splitlines() if l.strip()]
-    n = len(lines)
-    if n <= max_lines:
-        selected = lines
-    else:
-        head = lines[:15]
-        tail = lines[-(max_lines - 15):]
-        selected = head + ["… [context gap] …"] + tail
-    return "\n".join(selected)
+    lines = _stripped_lines(conversation)
+    if len(lines) <= max_lines:
+        return "\n".join(lines)
+    head = "\n".join(lines[:15])
+    tail = "\n".join(lines[-(max_lines - 15):])
+    return f"{head}\n… [context gap] …\n{tail}"
 
 def _extract_embedding_query(conversation: str) -> str:
     """
@@ -260,12 +268,13 @@ def vec_literal(arr: list[float]) -> str:
     return "[" + ",".join(str(x) for x in arr) + "]"
 
 def kb_search_prefetch(client_id: str, query_vec: list[float], locale: Optional[str]) -> list[dict]:
-    """Calls your SQL function kb_search and returns top-k rows (or [])."""
+    """Calls your SQL function kb_search and returns top-k rows (or []).
+    Ranking and the limit run in Postgres, so only KB_TOP_K rows come back over the wire."""
     vtxt = vec_literal(query_vec)  # pgvector text literal
     r = get_supabase_client().rpc("kb_search", {
         "p_client": client_id,
         "p_query_embedding": vtxt,
-        "p_top_k": 5,
+        "p_top_k": KB_TOP_K,
         "p_locale": (locale or None)
     }).execute()
     if hasattr(r, "error") and r.error:
@@ -354,9 +363,12 @@ def match_topk(client_id: str, vec: list[float], k: int) -> list[dict]:
     return r.data or []
 
 def load_intents(intent_ids: list[str]) -> list[dict]:
+    """Load shortlisted intents with their category embedded (intent.category_id FK),
+    so routing needs no second round trip after classification."""
     if not intent_ids: return []
     r = get_supabase_client().table("intent").select(
-        "id,name,description,category_id,action_policy_override,transfer_number_override,priority,routing_target"
+        "id,name,description,category_id,action_policy_override,transfer_number_override,priority,routing_target,"
+        "intent_category(id,name,default_action_policy,transfer_number,priority)"
     ).in_("id", intent_ids).execute()
     if hasattr(r, 'error') and r.error: 
         raise RuntimeError(r.error.message)
@@ -370,13 +382,21 @@ def load_category(category_id: Optional[str]) -> Optional[dict]:
     return None if (hasattr(r, "error") and r.error) else r.data
 
 def get_curated_clarifier(a: str, b: str) -> Optional[str]:
+    # the lookup matches either order, so cache under the sorted pair
+    key = (a, b) if a <= b else (b, a)
+    question = _clarifier_cache.get(key, _MISSING)
+    if question is not _MISSING:
+        return question
     cond = f"and(intent_id_a.eq.{a},intent_id_b.eq.{b}),and(intent_id_a.eq.{b},intent_id_b.eq.{a})"
     r = get_supabase_client().table("intent_clarifier").select("question,intent_id_a,intent_id_b").or_(cond).maybe_single().execute()
     if hasattr(r, "error") and r.error:
         return None
     if r is None or not hasattr(r, "data"):
-        return None
-    return (r.data or {}).get("question")
+        question = None
+    else:
+        question = (r.data or {}).get("question")
+    _clarifier_cache.set(key, question)
+    return question
 
 def classify_with_openai(utter_en: str, candidates: list[dict], target_language: Optional[str], cta_yes: bool = False) -> dict:
     """
@@ -429,7 +449,7 @@ REQUIRED JSON SCHEMA:
     print(f"Model: gpt-4o-mini")
     
     try:
-        print(f"Starting OpenAI API call at {time.time()}")
+        print(f"Starting OpenAI API call at {t0}")
         resp = get_openai_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
@@ -690,6 +710,14 @@ def _resolve_call_id(call_id: Optional[str], retell_event_id: Optional[str]) ->
     ev = (retell_event_id or "").strip()
     return f"RETELL:{ev}" if ev else f"auto:{uuidlib.uuid4()}"
 
+def _log_call_reason(row: dict) -> None:
+    """Insert a call_reason_log row (runs on _log_pool so the response doesn't wait on it)."""
+    try:
+        get_supabase_client().table("call_reason_log").insert(row, returning=ReturnMethod.minimal).execute()
+        print(f"Logged call_reason_log for call_id: {row.get('call_id')}")
+    except Exception as e:
+        print(f"Failed to log call_reason_log for call_id {row.get('call_id')}: {e}")
+
 # --- Language normalization helpers ---
 DG_LANG_MAP = {
     # english
@@ -794,8 +822,10 @@ def classify_intent():
         query_en = embed_query
         _translate_ms = 0
     else:
+        # The two translations are independent, so run them side by side
+        query_future = _io_pool.submit(translate_to_english, embed_query)
         ctx_en, t1 = translate_to_english(context_text)
-        query_en, t2 = translate_to_english(embed_query)
+        query_en, t2 = query_future.result()
         _translate_ms = max(t1, t2)  # keep one latency figure if you log it
 
     # Language for clarifying question
@@ -806,15 +836,20 @@ def classify_intent():
         return jsonify({"error": "No usable text to embed/classify"}), 400
         
     vec, embed_ms, emb_model = embed_english(query_en or ctx_en or "")
+
+    # 💡 start KB prefetch as soon as the vector exists, so it runs alongside the shortlist queries and the LLM
+    kb_future = _io_pool.submit(kb_search_prefetch, client_id, vec, caller_language or None)
+
     top = match_topk(client_id, vec, TOP_K)  # [{intent_id, similarity}]
     intent_ids = [t["intent_id"] for t in top]
     intents = load_intents(intent_ids)
     
     # Create mapping from intent_id to intent_name for topK telemetry
     intent_name_map = {i["id"]: i["name"] for i in intents}
+    intent_by_id = {i["id"]: i for i in intents}
     
     candidates = [{"id": i["id"], "name": i["name"], "description": i.get("description","")}
-                  for t in top for i in intents if i["id"] == t["intent_id"]]
+                  for i in (intent_by_id.get(t["intent_id"]) for t in top) if i]
 
     # Get per-client General Question intent ID
     general_question_id = get_general_question_intent_id(get_supabase_client(), client_id)
@@ -834,9 +869,6 @@ def classify_intent():
     if cta_yes:
         candidates = bubble_sales_candidates_first(candidates)
 
-    # 💡 start KB prefetch in parallel (cheap) while we talk to the LLM
-    kb_future = _kb_pool.submit(kb_search_prefetch, client_id, vec, caller_language or None)
-    
     # Handle case where no intents match
     if not candidates:
         print(f"=== NO MATCHING INTENTS ===")
@@ -847,34 +879,30 @@ def classify_intent():
         
         # Log unmatched intent to call_reason_log for analysis
         call_id = _resolve_call_id(provided_call_id, retell_event_id)
-        try:
-            get_supabase_client().table("call_reason_log").insert({
-                "client_id": client_id,
-                "call_id": call_id,
-                "primary_intent_id": None,  # No intent found
-                "confidence": 0.0,
-                "embedding_top1_sim": None,
-                "alternatives": [],
-                "clarifications_json": [],
-                "llm_model": None,
-                "embedding_model": emb_model,
-                "llm_latency_ms": None,
-                "embed_latency_ms": embed_ms,
-                "openrouter_request_id": None,
-                "prompt_tokens": None,
-                "completion_tokens": None,
-                "router_version": "v1",
-                "utterance": _redact_pii(context_text),
-                "detected_lang": (caller_language.lower() or None),
-                "utterance_en": _redact_pii(ctx_en),
-                "explanation": "No matching intents found in database - needs new intent creation",
-                "unmatched_intent": True,  # Flag for unmatched intents
-                "top_k_results": top,  # Log the vector search results for analysis
-                "query_text": _redact_pii(query_en or ctx_en)  # Log the query that failed to match
-            }).execute()
-            print(f"Logged unmatched intent to call_reason_log for call_id: {call_id}")
-        except Exception as e:
-            print(f"Failed to log unmatched intent: {e}")
+        _log_pool.submit(_log_call_reason, {
+            "client_id": client_id,
+            "call_id": call_id,
+            "primary_intent_id": None,  # No intent found
+            "confidence": 0.0,
+            "embedding_top1_sim": None,
+            "alternatives": [],
+            "clarifications_json": [],
+            "llm_model": None,
+            "embedding_model": emb_model,
+            "llm_latency_ms": None,
+            "embed_latency_ms": embed_ms,
+            "openrouter_request_id": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "router_version": "v1",
+            "utterance": _redact_pii(context_text),
+            "detected_lang": (caller_language.lower() or None),
+            "utterance_en": _redact_pii(ctx_en),
+            "explanation": "No matching intents found in database - needs new intent creation",
+            "unmatched_intent": True,  # Flag for unmatched intents
+            "top_k_results": top,  # Log the vector search results for analysis
+            "query_text": _redact_pii(query_en or ctx_en)  # Log the query that failed to match
+        })
         
         # Return a fallback response for unmatched intents
         return jsonify({
@@ -923,38 +951,35 @@ def classify_intent():
     routing = None
     best_row = None
     if (not needs) and (not is_general):
-        best_row = next((i for i in intents if i["id"] == best_id), intents[0] if intents else None)
-        category = load_category(best_row.get("category_id") if best_row else None)
+        best_row = intent_by_id.get(best_id) or (intents[0] if intents else None)
+        # Category comes embedded with the intent; fall back to a direct lookup if it's missing
+        category = (best_row or {}).get("intent_category") or load_category(best_row.get("category_id") if best_row else None)
         routing = effective_policy(best_row or {}, category)
 
     # 6) Log (rich but safe)
     call_id = _resolve_call_id(provided_call_id, retell_event_id)
-    try:
-        get_supabase_client().table("call_reason_log").insert({
-            "client_id": client_id,
-            "call_id": call_id,
-            "primary_intent_id": (best_row or {}).get("id"),
-            "confidence": cls.get("confidence"),
-            "embedding_top1_sim": (top[0]["similarity"] if top else None),
-            "alternatives": (cls.get("alternatives") or [])[:3],
-            "clarifications_json": [{"asked": bool(clarify_q)}] if cls.get("needs_clarification") else [],
-            "llm_model": cls.get("model"),
-            "embedding_model": emb_model,
-            "llm_latency_ms": cls.get("latency_ms"),
-            "embed_latency_ms": embed_ms,
-            "openrouter_request_id": cls.get("request_id"),
-            "prompt_tokens": cls.get("prompt_tokens"),
-            "completion_tokens": cls.get("completion_tokens"),
-            "router_version": "v1",
-            "utterance": _redact_pii(context_text),
-            "detected_lang": (caller_language.lower() or None),
-            "utterance_en": _redact_pii(ctx_en),
-            "explanation": cls.get("explanation", ""),
-            "unmatched_intent": not bool(candidates)
-        }).execute()
-        print(f"Successfully logged call_reason_log for call_id: {call_id}")
-    except Exception as e:
-        print(f"Failed to log call_reason_log for call_id {call_id}: {e}")
+    _log_pool.submit(_log_call_reason, {
+        "client_id": client_id,
+        "call_id": call_id,
+        "primary_intent_id": (best_row or {}).get("id"),
+        "confidence": cls.get("confidence"),
+        "embedding_top1_sim": (top[0]["similarity"] if top else None),
+        "alternatives": (cls.get("alternatives") or [])[:3],
+        "clarifications_json": [{"asked": bool(clarify_q)}] if cls.get("needs_clarification") else [],
+        "llm_model": cls.get("model"),
+        "embedding_model": emb_model,
+        "llm_latency_ms": cls.get("latency_ms"),
+        "embed_latency_ms": embed_ms,
+        "openrouter_request_id": cls.get("request_id"),
+        "prompt_tokens": cls.get("prompt_tokens"),
+        "completion_tokens": cls.get("completion_tokens"),
+        "router_version": "v1",
+        "utterance": _redact_pii(context_text),
+        "detected_lang": (caller_language.lower() or None),
+        "utterance_en": _redact_pii(ctx_en),
+        "explanation": cls.get("explanation", ""),
+        "unmatched_intent": not bool(candidates)
+    })
 
     # 7) Build result (must be STRING)
     result_obj = {
@@ -2,10 +2,10 @@
 Health and system route handlers
 """
 from flask import Blueprint, jsonify
-from datetime import datetime
+from utils.time_utils import utc_timestamp
 from utils.logger import get_logger
 from config import Config
-from supabase import create_client
+from utils.supabase_client import get_supabase_client
 
 logger = get_logger(__name__)
 
@@ -21,7 +21,7 @@ def health_check():
 
         system_info = {
             'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': utc_timestamp(),
             'supabase_configured': supabase_configured,
             'supabase_status': 'connected' if supabase_configured else 'disconnected',
             'environment': Config.FLASK_ENV,
@@ -31,7 +31,7 @@ def health_check():
         # Test Supabase connection if configured
         if supabase_configured:
             try:
-                client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
+                client = get_supabase_client()
                 # Light test query: fetch 1 row from a small table
                 resp = client.table('language').select('id').limit(1).execute()
                 system_info['supabase_test'] = 'success'
@@ -47,7 +47,7 @@ def health_check():
         logger.error(f"Health check failed: {e}")
         return jsonify({
             'status': 'unhealthy',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': utc_timestamp(),
             'error': str(e)
         }), 500
 
@@ -59,7 +59,7 @@ def system_status():
             'application': 'Siftly Retell AI Webhook Handler',
             'version': '1.0.0',
             'status': 'running',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': utc_timestamp(),
             'uptime': 'N/A',  # Could be enhanced with actual uptime tracking
             'services': {
                 'supabase': {
@@ -80,7 +80,7 @@ def system_status():
         logger.error(f"System status check failed: {e}")
         return jsonify({
             'status': 'error',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': utc_timestamp(),
             'error': str(e)
         }), 500
 
@@ -89,5 +89,5 @@ def ping():
     """Simple ping endpoint for load balancers"""
     return jsonify({
         'pong': True,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': utc_timestamp()
     }), 200 
\ No newline at end of file
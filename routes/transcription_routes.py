@@ -6,8 +6,9 @@ Twilio Media Streams (2 legs, 2 WS) -> 2x Deepgram -> append into same Supabase
     final    -> append to live_transcript_final, then clear partial
 """
 import base64
+import queue
 import threading
-import asyncio
+import time
 import orjson
 from typing import Dict, Any, Optional
 from urllib.parse import urlparse, parse_qs
@@ -18,7 +19,10 @@ import websocket  # websocket-client
 
 from config import Config
 from utils.logger import get_logger
-from supabase import create_client, Client
+from utils.supabase_client import get_supabase_client
+from supabase import Client
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
 
 logger = get_logger(__name__)
 
@@ -32,7 +36,7 @@ DG_URL = (
 )
 
 def supa() -> Client:
-    return create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
+    return get_supabase_client()
 
 def role_from_track(track: Optional[str]) -> str:
     # Map Twilio tracks to friendly labels
@@ -40,39 +44,131 @@ def role_from_track(track: Optional[str]) -> str:
     # outbound -> agent (dialed party / Retell)
     return "agent" if track == "outbound" else "user"
 
+# Set once PostgREST reports the append_live_transcript function missing (PGRST202),
+# so this process falls back to SELECT-then-UPDATE appends until it restarts
+_append_rpc_missing = False
+_append_rpc_lock = threading.Lock()
+
+def append_live_transcript(_supa: Client, call_sid: str, line: str, final: bool) -> None:
+    """
+    Append one line to the call's live transcript in a single round trip.
+    The append_live_transcript SQL function (see README) concatenates server-side,
+    so both legs can write to the same row without a read-modify-write race.
+    final=True appends to live_transcript_final and clears live_transcript_partial.
+    Falls back to the SELECT-then-UPDATE append when the function is not deployed.
+    """
+    global _append_rpc_missing
+    if not _append_rpc_missing:
+        try:
+            _supa.rpc("append_live_transcript", {
+                "p_call_sid": call_sid,
+                "p_line": line,
+                "p_final": final,
+            }).execute()
+            return
+        except APIError as e:
+            if e.code != "PGRST202":
+                raise
+            with _append_rpc_lock:
+                if not _append_rpc_missing:
+                    _append_rpc_missing = True
+                    logger.warning("append_live_transcript function not found (see README); "
+                                   "falling back to SELECT-then-UPDATE transcript appends")
+    _append_live_transcript_select_update(_supa, call_sid, line, final)
+
+def _append_live_transcript_select_update(_supa: Client, call_sid: str, line: str, final: bool) -> None:
+    """
+    Append one line by reading the current transcript and writing it back (two round trips).
+    Only used while the append_live_transcript SQL function is missing.
+    """
+    column = "live_transcript_final" if final else "live_transcript_partial"
+    sel = _supa.table("twilio_call")\
+        .select(column)\
+        .eq("call_sid", call_sid).single().execute()
+    existing = ""
+    if getattr(sel, "data", None):
+        existing = sel.data.get(column) or ""
+    update = {column: (existing + ("\n" if existing else "") + line).strip()}
+    if final:
+        update["live_transcript_partial"] = ""
+    _supa.table("twilio_call").update(update, returning=ReturnMethod.minimal).eq("call_sid", call_sid).execute()
+
+# Background transcript writers, so the Twilio receive loop never waits on Supabase.
+# A call_sid always maps to the same worker, which keeps that call's appends in order.
+TRANSCRIPT_WRITERS = 4
+TRANSCRIPT_QUEUE_SIZE = 2500  # per worker
+_write_queues = [queue.Queue(maxsize=TRANSCRIPT_QUEUE_SIZE) for _ in range(TRANSCRIPT_WRITERS)]
+_writers_started = False
+_writers_lock = threading.Lock()
+
+def _transcript_writer(q: "queue.Queue") -> None:
+    while True:
+        call_sid, line, final = q.get()
+        try:
+            append_live_transcript(supa(), call_sid, line, final)
+        except Exception as e:
+            logger.error("%s update error: %s", 'FINAL' if final else 'PARTIAL', e)
+
+def _start_writers() -> None:
+    # Started on first use (not at import) so each forked gunicorn worker gets its own threads
+    global _writers_started
+    with _writers_lock:
+        if _writers_started:
+            return
+        for q in _write_queues:
+            threading.Thread(target=_transcript_writer, args=(q,), daemon=True).start()
+        _writers_started = True
+
+def enqueue_transcript_append(call_sid: str, line: str, final: bool) -> bool:
+    """
+    Queue a live transcript append for the background writers.
+    FINAL lines wait up to 1s for queue space; PARTIAL lines are dropped when the queue is full.
+    Returns True if the append was queued.
+    """
+    if not _writers_started:
+        _start_writers()
+    q = _write_queues[hash(call_sid) % TRANSCRIPT_WRITERS]
+    try:
+        q.put((call_sid, line, final), block=final, timeout=1 if final else None)
+        return True
+    except queue.Full:
+        logger.warning("Transcript write queue full; dropped %s line for %s", 'FINAL' if final else 'PARTIAL', call_sid)
+        return False
+
+def _dig(obj: Any, *keys: Any) -> Any:
+    """
+    Follow dict keys / list indexes into a decoded JSON message.
+    Returns None at the first missing level (no throwaway default dicts).
+    """
+    for key in keys:
+        try:
+            obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return obj
+
+# Where Deepgram puts the transcript, in the order the payload shapes are tried
+_TRANSCRIPT_PATHS = (
+    ("channel", "alternatives", 0, "transcript"),                # common form
+    ("results", "channels", 0, "alternatives", 0, "transcript"),  # single-channel stream under results
+    ("results", "alternatives", 0, "transcript"),                # some payloads: results.alternatives
+    ("transcript",),
+)
+
+# Deepgram control messages that never carry a transcript (dropped before queueing)
+_DG_NON_TRANSCRIPT_TYPES = frozenset(("Metadata", "SpeechStarted", "UtteranceEnd"))
+
 def extract_channel_texts_and_final(dg_msg: Dict[str, Any]):
     """
     Tolerant parser for Deepgram transcript events.
     Returns (text: str | None, is_final: bool)
     """
     is_final = bool(dg_msg.get("is_final", False))
-    text = None
-
-    # Common forms
-    if "channel" in dg_msg and isinstance(dg_msg["channel"], dict):
-        alts = dg_msg["channel"].get("alternatives") or []
-        if alts and isinstance(alts[0], dict):
-            text = (alts[0].get("transcript") or "").strip()
-
-    elif "results" in dg_msg and isinstance(dg_msg["results"], dict):
-        # Single-channel stream; might still be under results
-        channels = dg_msg["results"].get("channels") or []
-        if channels:
-            alts = channels[0].get("alternatives") or []
-            if alts and isinstance(alts[0], dict):
-                text = (alts[0].get("transcript") or "").strip()
-        else:
-            # Some payloads: results.alternatives
-            alts = dg_msg["results"].get("alternatives") or []
-            if alts and isinstance(alts[0], dict):
-                text = (alts[0].get("transcript") or "").strip()
-
-    elif isinstance(dg_msg.get("transcript"), str):
-        text = dg_msg["transcript"].strip()
-
-    if text:
-        text = " ".join(text.split())  # normalize whitespace
-    return text, is_final
+    for path in _TRANSCRIPT_PATHS:
+        text = _dig(dg_msg, *path)
+        if isinstance(text, str):
+            return " ".join(text.split()), is_final  # strips and normalizes whitespace
+    return None, is_final
 
 
 @sock.route("/transcription/stream")
@@ -91,12 +187,10 @@ def transcription_stream(ws):
         url_track_hint = None
 
     # State
-    _supa = supa()
     call_sid: Optional[str] = None
     current_track: Optional[str] = url_track_hint  # 'inbound' / 'outbound' or None
 
-    # Queues
-    audio_queue = []
+    # Deepgram events received by the WS runner thread
     events_queue = []
     
     # Throttling for partial updates (avoid spam)
@@ -110,15 +204,16 @@ def transcription_stream(ws):
     def on_message(dgws, message):
         try:
             data = orjson.loads(message)
-            events_queue.append(data)
+            if data.get("type") not in _DG_NON_TRANSCRIPT_TYPES:
+                events_queue.append(data)
         except Exception as e:
-            logger.error(f"DG message parse error: {e}")
+            logger.error("DG message parse error: %s", e)
 
     def on_error(dgws, error):
-        logger.error(f"Deepgram WS error: {error}")
+        logger.error("Deepgram WS error: %s", error)
 
     def on_close(dgws, code, msg):
-        logger.info(f"Deepgram WS closed: code={code}, msg={msg}")
+        logger.info("Deepgram WS closed: code=%s, msg=%s", code, msg)
 
     def on_open(dgws):
         logger.info("Deepgram WS opened")
@@ -133,47 +228,36 @@ def transcription_stream(ws):
         on_close=on_close,
     )
 
-    def sender():
-        logger.info("Audio sender thread started; waiting for DG open...")
-        if not ws_open.wait(timeout=8):
-            logger.error("Deepgram WS did not open within 8s; stopping sender")
+    # Buffer ~200ms of μ-law 8k (160 bytes per 20 ms -> 200 ms = 1600 bytes)
+    BYTES_PER_20MS = 160
+    TARGET_MS = 200
+    PACKET_BYTES = (TARGET_MS // 20) * BYTES_PER_20MS
+    DG_OPEN_TIMEOUT_S = 8
+    audio_buf = bytearray()
+    sent_packets = 0
+    forwarding = True
+    connected_at = time.monotonic()
+
+    def forward_audio(chunk: bytes) -> None:
+        # Batch audio and send it from this loop (no per-connection sender thread polling a list)
+        nonlocal sent_packets, forwarding
+        audio_buf.extend(chunk)
+        if len(audio_buf) < PACKET_BYTES:
             return
-
-        # Buffer ~200ms of μ-law 8k (160 bytes per 20 ms -> 200 ms = 1600 bytes)
-        BYTES_PER_20MS = 160
-        TARGET_MS = 200
-        PACKET_BYTES = (TARGET_MS // 20) * BYTES_PER_20MS
-        buf = bytearray()
-        sent_packets = 0
-
-        while True:
-            if audio_queue:
-                chunk = audio_queue.pop(0)
-                if chunk is None:
-                    # flush leftover
-                    if buf:
-                        try:
-                            dg_ws.send(bytes(buf), websocket.ABNF.OPCODE_BINARY)
-                        except Exception as e:
-                            logger.error(f"Flush send error: {e}")
-                        buf.clear()
-                    logger.info(f"Sender exit. Packets sent: {sent_packets}")
-                    break
-                try:
-                    buf.extend(chunk)
-                    if len(buf) >= PACKET_BYTES:
-                        dg_ws.send(bytes(buf), websocket.ABNF.OPCODE_BINARY)
-                        sent_packets += 1
-                        buf.clear()
-                except Exception as e:
-                    logger.error(f"Send error: {e}")
-                    break
-            else:
-                import time
-                time.sleep(0.005)
-
-    sender_thread = threading.Thread(target=sender, daemon=True)
-    sender_thread.start()
+        if not ws_open.is_set():
+            # Keep buffering until Deepgram opens; give up if it never does
+            if time.monotonic() - connected_at > DG_OPEN_TIMEOUT_S:
+                logger.error("Deepgram WS did not open within %ss; stopping audio forwarding", DG_OPEN_TIMEOUT_S)
+                forwarding = False
+                audio_buf.clear()
+            return
+        try:
+            dg_ws.send(bytes(audio_buf), websocket.ABNF.OPCODE_BINARY)
+            sent_packets += 1
+        except Exception as e:
+            logger.error("Send error: %s", e)
+            forwarding = False
+        audio_buf.clear()
 
     runner_thread = threading.Thread(
         target=lambda: dg_ws.run_forever(ping_interval=30, ping_timeout=10),
@@ -203,29 +287,34 @@ def transcription_stream(ws):
                 mf = s.get("mediaFormat", {})
                 tracks = s.get("tracks") or []
                 # If Twilio tells us the track list, keep it for logs
-                logger.info(f"Start: callSid={call_sid}, tracks={tracks}, mediaFormat={mf}")
+                logger.info("Start: callSid=%s, tracks=%s, mediaFormat=%s", call_sid, tracks, mf)
 
                 # Trust Twilio 'media.track' per-media; fall back to URL hint for labeling
                 # REMOVE the upsert/insert here to avoid duplicate-key races
                 # The row is already created in /voice-webhook
 
             elif etype == "media":
-                track = evt.get("media", {}).get("track")  # 'inbound' or 'outbound'
+                media = evt.get("media") or {}
+                track = media.get("track")  # 'inbound' or 'outbound'
                 if track:
                     current_track = track  # remember last-seen track for labels
-                payload_b64 = evt.get("media", {}).get("payload")
-                if payload_b64:
+                payload_b64 = media.get("payload")
+                if payload_b64 and forwarding:
                     try:
                         audio_bytes = base64.b64decode(payload_b64)
-                        audio_queue.append(audio_bytes)
                     except Exception as e:
-                        logger.error(f"b64 decode error: {e}")
+                        logger.error("b64 decode error: %s", e)
+                    else:
+                        forward_audio(audio_bytes)
 
             elif etype == "stop":
-                logger.info(f"Stop for CallSid={call_sid}")
+                logger.info("Stop for CallSid=%s", call_sid)
                 break
 
-            # Drain Deepgram events
+            # Drain Deepgram events, coalescing what arrived since the last frame
+            # into at most one FINAL and one PARTIAL write
+            final_lines = []
+            partial_line = None
             while events_queue:
                 dg_msg = events_queue.pop(0)
                 text, is_final = extract_channel_texts_and_final(dg_msg)
@@ -236,49 +325,29 @@ def transcription_stream(ws):
                 line = f"[{who}] {text}".strip()
 
                 if is_final:
-                    # Append to FINAL and clear PARTIAL
-                    try:
-                        sel = _supa.table("twilio_call")\
-                            .select("live_transcript_final")\
-                            .eq("call_sid", call_sid).single().execute()
-                        existing = ""
-                        if getattr(sel, "data", None):
-                            existing = sel.data.get("live_transcript_final") or ""
-                        new_final = (existing + ("\n" if existing else "") + line).strip()
-                        _supa.table("twilio_call").update({
-                            "live_transcript_final": new_final,
-                            "live_transcript_partial": ""
-                        }).eq("call_sid", call_sid).execute()
-                    except Exception as e:
-                        logger.error(f"FINAL update error: {e}")
-                else:
-                    # Append to PARTIAL (with throttling)
-                    import time
-                    import random
-                    current_time = time.time() * 1000  # Convert to milliseconds
-                    if current_time - last_partial_update >= PARTIAL_THROTTLE_MS:
-                        # Small random jitter to reduce DB write collisions
-                        time.sleep(random.uniform(0, 0.05))
-                        try:
-                            sel = _supa.table("twilio_call")\
-                                .select("live_transcript_partial")\
-                                .eq("call_sid", call_sid).single().execute()
-                            existing = ""
-                            if getattr(sel, "data", None):
-                                existing = sel.data.get("live_transcript_partial") or ""
-                            new_partial = (existing + ("\n" if existing else "") + line).strip()
-                            _supa.table("twilio_call").update({
-                                "live_transcript_partial": new_partial
-                            }).eq("call_sid", call_sid).execute()
-                            last_partial_update = current_time
-                        except Exception as e:
-                            logger.error(f"PARTIAL update error: {e}")
+                    final_lines.append(line)
+                    partial_line = None  # the FINAL write clears PARTIAL
+                elif partial_line is None:
+                    partial_line = line
+
+            if final_lines:
+                # Append to FINAL and clear PARTIAL
+                enqueue_transcript_append(call_sid, "\n".join(final_lines), final=True)
+            if partial_line is not None:
+                # Append to PARTIAL (with throttling)
+                current_time = time.time() * 1000  # Convert to milliseconds
+                if current_time - last_partial_update >= PARTIAL_THROTTLE_MS:
+                    if enqueue_transcript_append(call_sid, partial_line, final=False):
+                        last_partial_update = current_time
 
     finally:
-        try:
-            audio_queue.append(None)
-        except Exception:
-            pass
+        # flush leftover
+        if audio_buf and forwarding and ws_open.is_set():
+            try:
+                dg_ws.send(bytes(audio_buf), websocket.ABNF.OPCODE_BINARY)
+            except Exception as e:
+                logger.error("Flush send error: %s", e)
+        logger.info("Audio forwarding done. Packets sent: %s", sent_packets)
         try:
             # politely tell DG we're done
             dg_ws.close()
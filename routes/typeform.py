@@ -2,40 +2,70 @@
 Typeform integration routes for dynamic form creation and webhook handling
 """
 from flask import Blueprint, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import repeat
 import os
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 from typing import Dict, List, Any, Optional
+from openai import OpenAI
 from utils.logger import get_logger
 from config import Config
-from supabase import create_client
+from utils.supabase_client import get_supabase_client, fetch_one
 
 logger = get_logger(__name__)
 
 # Create blueprint
 typeform_bp = Blueprint('typeform', __name__, url_prefix='/typeform')
 
-# Initialize Supabase client
-def get_supabase_client():
-    return create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
-
 # Typeform API configuration
 TYPEFORM_API_KEY = os.getenv('TYPEFORM_API_KEY')
 TYPEFORM_WEBHOOK_URL = os.getenv('TYPEFORM_WEBHOOK_URL')
 TYPEFORM_API_BASE_URL = "https://api.typeform.com"
 
+# Keep-alive session so form creation and webhook registration share one TLS connection
+_typeform_session = requests.Session()
+_typeform_session.mount(TYPEFORM_API_BASE_URL, HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_typeform_session.headers.update({
+    'Authorization': f'Bearer {TYPEFORM_API_KEY}',
+    'Content-Type': 'application/json'
+})
+
+# OpenAI client for field translations (created on first use, then shared)
+_openai_client: Optional[OpenAI] = None
+
+def get_openai_client() -> OpenAI:
+    """Get the shared OpenAI client used for translations"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(api_key=Config.OPENAI_API_KEY)
+    return _openai_client
+
+# Typeform field types whose choice labels are translated
+CHOICE_FIELD_TYPES = frozenset(('dropdown', 'multiple_choice'))
+
+# Translations are independent OpenAI calls, so a form's texts are translated concurrently
+_translation_pool = ThreadPoolExecutor(max_workers=8)
+
+# Only the columns build_typeform_fields / create_dynamic_typeform actually read
+# (plus the standard field id that keys the batched lookup)
+STANDARD_FIELD_COLUMNS = 'id, ref, type, title, choices'
+SCREEN_DATA_COLUMNS = (
+    'welcome_screen_title, welcome_screen_button_text, welcome_screen_ref, '
+    'thank_you_screen_title, thank_you_screen_button_text, thank_you_screen_ref, '
+    'thank_you_screen_redirect_url'
+)
+
 def translate_text(text: str, target_language: str) -> str:
     """
     Translate text using OpenAI GPT-3.5-turbo
     """
     try:
-        import openai
-        openai.api_key = Config.OPENAI_API_KEY
-        
         prompt = f"Translate this text to {target_language}. Only return the translated text, nothing else: {text}"
         
-        response = openai.ChatCompletion.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "user", "content": prompt}
@@ -52,6 +82,12 @@ def translate_text(text: str, target_language: str) -> str:
         logger.error(f"Translation failed for '{text}' to {target_language}: {e}")
         return text  # Fallback to original text
 
+def translate_texts(texts: List[str], target_language: str) -> List[str]:
+    """
+    Translate several texts concurrently, keeping their order
+    """
+    return list(_translation_pool.map(translate_text, texts, repeat(target_language)))
+
 def get_client_question_fields(client_id: str) -> List[Dict[str, Any]]:
     """
     Get client question fields ordered by order_number
@@ -68,16 +104,18 @@ def get_client_question_fields(client_id: str) -> List[Dict[str, Any]]:
             logger.warning(f"No question fields found for client_id: {client_id}")
             return []
         
-        # Get standard field details for each question
+        # Get standard field details for all questions in one query
+        standard_field_ids = list({field['standard_field_id'] for field in response.data})
+        std_response = supabase.table('standard_question_fields').select(
+            STANDARD_FIELD_COLUMNS
+        ).in_('id', standard_field_ids).execute()
+        standard_fields = {row['id']: row for row in std_response.data or []}
+        
         question_fields = []
         for field in response.data:
-            standard_field_id = field['standard_field_id']
+            standard_field = standard_fields.get(field['standard_field_id'])
             
-            # Get standard field details
-            std_response = supabase.table('standard_question_fields').select('*').eq('id', standard_field_id).limit(1).execute()
-            
-            if std_response.data:
-                standard_field = std_response.data[0]
+            if standard_field:
                 question_fields.append({
                     'order_number': field['order_number'],
                     'standard_field': standard_field
@@ -97,13 +135,13 @@ def get_typeform_screen_data() -> Dict[str, Any]:
     try:
         supabase = get_supabase_client()
         
-        response = supabase.table('typeform_screen_data').select('*').eq('id', 'b117a8ac-1724-44f2-bae5-e527895c17f0').limit(1).execute()
+        screen_data = fetch_one(supabase.table('typeform_screen_data').select(SCREEN_DATA_COLUMNS).eq('id', 'b117a8ac-1724-44f2-bae5-e527895c17f0'))
         
-        if not response.data:
+        if not screen_data:
             logger.warning("No typeform screen data found")
             return {}
         
-        return response.data[0]
+        return screen_data
         
     except Exception as e:
         logger.error(f"Error getting typeform screen data: {e}")
@@ -115,11 +153,20 @@ def build_typeform_fields(question_fields: List[Dict[str, Any]], caller_language
     """
     fields = []
     
+    # Translate every title and choice label in one concurrent batch, then consume in order
+    texts = []
+    for question in question_fields:
+        standard_field = question['standard_field']
+        texts.append(standard_field.get('title', ''))
+        if standard_field.get('type') in CHOICE_FIELD_TYPES and standard_field.get('choices'):
+            texts.extend(choice.get('label', '') for choice in standard_field['choices'])
+    translations = iter(translate_texts(texts, caller_language))
+    
     for question in question_fields:
         standard_field = question['standard_field']
         
-        # Translate title
-        title = translate_text(standard_field.get('title', ''), caller_language)
+        # Translated title
+        title = next(translations)
         
         # Build field structure for Typeform v2
         field = {
@@ -131,10 +178,10 @@ def build_typeform_fields(question_fields: List[Dict[str, Any]], caller_language
         }
         
         # Handle choices for dropdown/multiple_choice fields
-        if standard_field.get('type') in ['dropdown', 'multiple_choice'] and standard_field.get('choices'):
+        if standard_field.get('type') in CHOICE_FIELD_TYPES and standard_field.get('choices'):
             choices = []
             for choice in standard_field['choices']:
-                translated_label = translate_text(choice.get('label', ''), caller_language)
+                translated_label = next(translations)
                 choices.append({
                     "ref": choice.get('ref', ''),
                     "label": translated_label
@@ -150,18 +197,14 @@ def create_typeform_v2(form_data: Dict[str, Any]) -> Optional[str]:
     Create Typeform using v2 API
     """
     try:
-        headers = {
-            'Authorization': f'Bearer {TYPEFORM_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
         # Typeform v2 API endpoint
         url = f"{TYPEFORM_API_BASE_URL}/forms"
         
-        response = requests.post(url, headers=headers, json=form_data)
+        response = _typeform_session.post(url, data=orjson.dumps(form_data), timeout=(3, 30))
         
         if response.status_code == 201:
-            form_id = response.json().get('id')
+            # The create response echoes the whole form definition; orjson parses it straight from bytes
+            form_id = orjson.loads(response.content).get('id')
             logger.info(f"Created Typeform with ID: {form_id}")
             return form_id
         else:
@@ -177,11 +220,6 @@ def add_webhook_to_typeform(form_id: str) -> bool:
     Add webhook URL to existing Typeform
     """
     try:
-        headers = {
-            'Authorization': f'Bearer {TYPEFORM_API_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
         webhook_data = {
             "url": TYPEFORM_WEBHOOK_URL,
             "enabled": True
@@ -189,7 +227,7 @@ def add_webhook_to_typeform(form_id: str) -> bool:
         
         url = f"{TYPEFORM_API_BASE_URL}/forms/{form_id}/webhooks"
         
-        response = requests.post(url, headers=headers, json=webhook_data)
+        response = _typeform_session.post(url, data=orjson.dumps(webhook_data), timeout=(3, 30))
         
         if response.status_code in [200, 201]:
             logger.info(f"Added webhook to Typeform {form_id}")
@@ -255,10 +293,18 @@ def create_dynamic_typeform():
             "cui_settings": {"typing_emulation_speed": "medium"}
         }
         
+        # Translate the welcome and thank you screen texts in one concurrent batch
+        screen_texts = []
+        if screen_data.get('welcome_screen_title'):
+            screen_texts += [screen_data['welcome_screen_title'], screen_data.get('welcome_screen_button_text', 'Start')]
+        if screen_data.get('thank_you_screen_title'):
+            screen_texts += [screen_data['thank_you_screen_title'], screen_data.get('thank_you_screen_button_text', 'Done')]
+        screen_translations = iter(translate_texts(screen_texts, caller_language))
+        
         # Add welcome screen if available
         if screen_data.get('welcome_screen_title'):
-            welcome_title = translate_text(screen_data['welcome_screen_title'], caller_language)
-            welcome_button = translate_text(screen_data.get('welcome_screen_button_text', 'Start'), caller_language)
+            welcome_title = next(screen_translations)
+            welcome_button = next(screen_translations)
             
             form_data["welcome_screens"] = [{
                 "ref": screen_data.get('welcome_screen_ref', 'welcome'),
@@ -270,8 +316,8 @@ def create_dynamic_typeform():
         
         # Add thank you screen if available
         if screen_data.get('thank_you_screen_title'):
-            thank_title = translate_text(screen_data['thank_you_screen_title'], caller_language)
-            thank_button = translate_text(screen_data.get('thank_you_screen_button_text', 'Done'), caller_language)
+            thank_title = next(screen_translations)
+            thank_button = next(screen_translations)
             
             form_data["thankyou_screens"] = [{
                 "ref": screen_data.get('thank_you_screen_ref', 'thankyou'),
@@ -336,7 +382,7 @@ def typeform_webhook():
     try:
         data = request.get_json()
         
-        logger.info(f"Received Typeform webhook: {json.dumps(data, indent=2)}")
+        logger.info("Received Typeform webhook: %s", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
         
         # Extract form response data
         form_response = data.get('form_response', {})
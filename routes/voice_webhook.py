@@ -1,20 +1,75 @@
 """
 Voice webhook route handlers for Twilio integration with Retell AI + Media Streams (stereo)
 """
+import logging
 import os
+import re
+import orjson
 import requests
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict, Any
 from flask import Blueprint, request, Response
 from twilio.twiml.voice_response import VoiceResponse, Dial, Start
 from config import Config
+from utils.cache import TTLCache
 from utils.logger import get_logger
-from supabase import create_client, Client
+from utils.validators import normalize_phone_number, is_valid_twilio_signature
+from services.callers import get_or_create_caller
+from services.dynamic_variables import DEFAULT_DYNAMIC_VARIABLES, get_client_dynamic_variables
+from services.phone_index import phone_index, TWILIO_NUMBER_COLUMNS
+from utils.supabase_client import get_supabase_client, fetch_one
+from supabase import Client
 
 logger = get_logger(__name__)
 
 # IMPORTANT: expose exactly /voice-webhook (no prefix)
 voice_bp = Blueprint("voice", __name__, url_prefix="")
 
+# shared thread pool for the independent Supabase lookups made per inbound call
+_lookup_pool = ThreadPoolExecutor(max_workers=8)
+
+# Retell agent ids by client_ivr_language_configuration_id (agent assignments change rarely)
+_agent_id_cache = TTLCache(ttl_seconds=300, maxsize=512)
+
+RETELL_REGISTER_URL = "https://api.retellai.com/v2/register-phone-call"
+
+# Twilio auth token as the HMAC key for X-Twilio-Signature checks (encoded once)
+_TWILIO_SIGNING_KEY = (Config.TWILIO_AUTH_TOKEN or "").encode()
+
+# Retell's SIP endpoint that each call is bridged to
+RETELL_SIP_DOMAIN = "5t4n6j0wnrl.sip.livekit.cloud"
+
+def _say_twiml(message: str) -> bytes:
+    """Encode a TwiML document that only speaks a message"""
+    return f'<?xml version="1.0" encoding="UTF-8"?><Response><Say>{message}</Say></Response>'.encode()
+
+# Fixed TwiML bodies for the /voice-webhook error responses (encoded once at import)
+_TWIML_INVALID_REQUEST = _say_twiml("Invalid request parameters")
+_TWIML_NO_SERVICE = _say_twiml("Service not available for this number")
+_TWIML_UNAVAILABLE = _say_twiml("Service temporarily unavailable")
+_TWIML_ERROR = _say_twiml("An error occurred processing your call")
+
+# Scheme + host of a PUBLIC_HOSTNAME given as a full URL (e.g. "wss://host/transcription/stream")
+_PUBLIC_URL_RE = re.compile(r"^(?:wss|https?)://(?P<host>[^/]*)")
+
+# Placeholder rendered into the TwiML template where the per-call Retell call_id goes
+_CALL_ID_PLACEHOLDER = "__RETELL_CALL_ID__"
+
+# Keep-alive session so each /voice-webhook reuses the TLS connection to Retell
+_retell_session = requests.Session()
+_retell_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        # Only idempotent methods are retried; register-phone-call (POST) is not
+        max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[429, 500, 502, 503, 504]),
+    ),
+)
+
 class VoiceWebhookService:
     """Service for handling voice webhook operations"""
 
@@ -33,157 +88,136 @@ class VoiceWebhookService:
         else:
             # Extract just the hostname from the full WebSocket URL
             # Example: "wss://siftly-retell-supa.onrender.com/transcription/stream" -> "siftly-retell-supa.onrender.com"
-            if self.public_hostname.startswith("wss://"):
-                self.public_hostname = self.public_hostname.replace("wss://", "").split("/")[0]
-            elif self.public_hostname.startswith("https://"):
-                self.public_hostname = self.public_hostname.replace("https://", "").split("/")[0]
-            elif self.public_hostname.startswith("http://"):
-                self.public_hostname = self.public_hostname.replace("http://", "").split("/")[0]
+            match = _PUBLIC_URL_RE.match(self.public_hostname)
+            if match:
+                self.public_hostname = match.group("host")
+
+        # Only the call_id changes between calls, so render the TwiML tree once
+        self._twiml_head, self._twiml_tail = self._build_twiml(_CALL_ID_PLACEHOLDER).split(_CALL_ID_PLACEHOLDER)
 
     def get_supabase_client(self) -> Client:
-        """Get Supabase client using your existing pattern"""
-        return create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
+        """Get the shared Supabase client"""
+        return get_supabase_client()
+
+    def get_twilio_number_row(self, to_number: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the twilio_number row for the called number (tried cleaned, then as received)
+
+        Resolved once per call and passed to the agent and dynamic variable lookups.
+        """
+        try:
+            cleaned_number = normalize_phone_number(to_number)
+            tw_row = phone_index.lookup(cleaned_number, to_number)
+            if tw_row is not None:
+                return tw_row
+            if phone_index.is_missing(cleaned_number, to_number):
+                logger.warning("No twilio_number record found for: %s (recently checked)", to_number)
+                return None
+
+            # Not in the in-memory index yet, query Supabase directly
+            tw_row = fetch_one(self.get_supabase_client().table('twilio_number').select(TWILIO_NUMBER_COLUMNS).eq('twilio_number', cleaned_number))
+            if not tw_row and cleaned_number != to_number:
+                # Fallback to original number if cleaned doesn't work
+                tw_row = fetch_one(self.get_supabase_client().table('twilio_number').select(TWILIO_NUMBER_COLUMNS).eq('twilio_number', to_number))
+            if not tw_row:
+                phone_index.mark_missing(cleaned_number, to_number)
+                logger.warning("No twilio_number record found for: %s (cleaned: %s)", to_number, cleaned_number)
+                return None
+            return tw_row
+
+        except Exception as e:
+            logger.error("Supabase lookup error: %s", e)
+            return None
 
     # ---------- Supabase lookup chain ----------
     # 1) Find row in table twilio_number where twilio_number == To
     # 2) Read client_ivr_language_configuration_id
     # 3) Find row in table retell_agent_id where client_ivr_language_configuration_id matches
     # 4) Return agent_id
-    def get_agent_id_from_supabase(self, to_number: str) -> Optional[str]:
+    def get_agent_id_from_supabase(self, to_number: str, tn_row: Optional[Dict[str, Any]] = None) -> Optional[str]:
         try:
             supabase = self.get_supabase_client()
             
-            tn = (
-                supabase.table("twilio_number")
-                .select("client_ivr_language_configuration_id")
-                .eq("twilio_number", to_number)
-                .single()
-                .execute()
-            )
-
-            if not tn or not getattr(tn, "data", None):
-                logger.warning(f"No twilio_number row for: {to_number}")
-                return None
+            if tn_row is None:
+                tn_row = self.get_twilio_number_row(to_number)
+                if tn_row is None:
+                    return None
 
-            civr_id = tn.data.get("client_ivr_language_configuration_id")
+            civr_id = tn_row.get("client_ivr_language_configuration_id")
             if not civr_id:
-                logger.warning(f"No client_ivr_language_configuration_id for: {to_number}")
+                logger.warning("No client_ivr_language_configuration_id for: %s", to_number)
                 return None
 
-            ra = (
+            agent_id = _agent_id_cache.get(civr_id)
+            if agent_id:
+                logger.info("Resolved cached agent_id '%s' for To %s", agent_id, to_number)
+                return agent_id
+
+            ra_row = fetch_one(
                 supabase.table("retell_agent_id")
                 .select("agent_id")
                 .eq("client_ivr_language_configuration_id", civr_id)
-                .single()
-                .execute()
             )
 
-            if not ra or not getattr(ra, "data", None):
-                logger.warning(f"No retell_agent_id row for civr_id: {civr_id}")
+            if not ra_row:
+                logger.warning("No retell_agent_id row for civr_id: %s", civr_id)
                 return None
 
-            agent_id = ra.data.get("agent_id")
+            agent_id = ra_row.get("agent_id")
             if not agent_id or not isinstance(agent_id, str):
-                logger.warning(f"Invalid agent_id for civr_id: {civr_id}")
+                logger.warning("Invalid agent_id for civr_id: %s", civr_id)
                 return None
+            _agent_id_cache.set(civr_id, agent_id)
 
-            logger.info(f"Resolved agent_id '{agent_id}' for To {to_number}")
+            logger.info("Resolved agent_id '%s' for To %s", agent_id, to_number)
             return agent_id
 
         except Exception as e:
-            logger.error(f"Supabase lookup error: {e}")
+            logger.error("Supabase lookup error: %s", e)
             return None
 
-    def _get_dynamic_variables_from_supabase(self, to_number: str, from_number: str, original_call_sid: str) -> Dict[str, Any]:
+    def _create_retell_event(self, from_number: str, to_number: str):
+        """
+        Create the initial retell_event record (updated later by the call_started webhook)
+        """
+        retell_event_data = {
+            'from_number': from_number,
+            'to_number': to_number,
+            'agent_id': 'pending',  # Will be updated by call_started webhook
+            'call_status': 'inbound',  # Initial status
+            'direction': 'inbound'
+        }
+        return self.get_supabase_client().table('retell_event').insert(retell_event_data).execute()
+
+    def _get_dynamic_variables_from_supabase(self, to_number: str, from_number: str, original_call_sid: str,
+                                             tw_row: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Get dynamic variables using the same chain as call_inbound webhook
         """
         try:
-            logger.info(f"Getting dynamic variables for to_number: {to_number}, from_number: {from_number}")
+            logger.info("Getting dynamic variables for to_number: %s, from_number: %s", to_number, from_number)
             
-            # Clean phone number by removing spaces and special characters
-            cleaned_number = to_number.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-            logger.info(f"Original number: {to_number}, Cleaned number: {cleaned_number}")
+            # Step 1: Find client via twilio_number (skipped when the caller already resolved it)
+            if tw_row is None:
+                tw_row = self.get_twilio_number_row(to_number)
+                if tw_row is None:
+                    return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
             
-            # Step 1: Find client via twilio_number (try both original and cleaned)
-            tw_resp = self.get_supabase_client().table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', cleaned_number).limit(1).execute()
-            if not tw_resp.data:
-                # Fallback to original number if cleaned doesn't work
-                tw_resp = self.get_supabase_client().table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', to_number).limit(1).execute()
-            if not tw_resp.data:
-                logger.warning(f"No twilio_number record found for: {to_number} (cleaned: {cleaned_number})")
-                return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
-            
-            client_id = tw_resp.data[0].get('client_id')
-            client_ivr_language_configuration_id = tw_resp.data[0].get('client_ivr_language_configuration_id')
+            client_id = tw_row.get('client_id')
+            client_ivr_language_configuration_id = tw_row.get('client_ivr_language_configuration_id')
             if not client_id:
-                logger.warning(f"twilio_number {to_number} has no client_id")
+                logger.warning("twilio_number %s has no client_id", to_number)
                 return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
 
-            # Step 2: Get client information and configuration
-            dynamic_variables: Dict[str, Any] = {}
-            
-            # Get client basic info
-            client_resp = self.get_supabase_client().table('client').select('name, client_description').eq('id', client_id).limit(1).execute()
-            if client_resp.data:
-                client = client_resp.data[0]
-                client_name = client.get('name', 'Our Company')
-                client_description = client.get('client_description', '')
-                dynamic_variables['client_id'] = client_id
-                dynamic_variables['client_name'] = client_name
-                dynamic_variables['client_description'] = client_description
-                logger.info(f"Client data - client_id: '{client_id}', name: '{client_name}', description: '{client_description}'")
-
-            # Get client workflow configuration
-            wf_resp = self.get_supabase_client().table('client_workflow_configuration').select('*').eq('client_id', client_id).limit(1).execute()
-            if wf_resp.data:
-                wf_config = wf_resp.data[0]
-                logger.info(f"Workflow config raw data: {wf_config}")
-                # Add workflow configuration as dynamic variables (without workflow_ prefix)
-                for key, value in wf_config.items():
-                    if key != 'id' and key != 'client_id' and value is not None:
-                        dynamic_variables[key] = value
-                        logger.info(f"Added {key}: '{value}'")
-
-            # Get client language agent names using the new structure
-            if client_ivr_language_configuration_id:
-                # Get all languages for this client's IVR configuration
-                ivr_lang_resp = self.get_supabase_client().table('client_ivr_language_configuration_language').select(
-                    'language_id'
-                ).eq('client_id', client_id).eq('client_ivr_language_configuration_id', client_ivr_language_configuration_id).execute()
-                
-                if ivr_lang_resp.data:
-                    # Get agent names for each language
-                    for lang_record in ivr_lang_resp.data:
-                        language_id = lang_record.get('language_id')
-                        if language_id:
-                            # Get agent name for this language
-                            agent_resp = self.get_supabase_client().table('client_language_agent_name').select(
-                                'agent_name'
-                            ).eq('client_id', client_id).eq('language_id', language_id).limit(1).execute()
-                            
-                            if agent_resp.data:
-                                agent_name = agent_resp.data[0].get('agent_name')
-                                if agent_name:
-                                    # Get language code for the key
-                                    lang_resp = self.get_supabase_client().table('language').select('language_code').eq('id', language_id).limit(1).execute()
-                                    if lang_resp.data:
-                                        lang_code = lang_resp.data[0].get('language_code', 'en')
-                                        dynamic_variables[f'agent_name_{lang_code}'] = agent_name
-                                        logger.info(f"Added agent_name_{lang_code}: {agent_name}")
-            else:
-                # Fallback: Get all agent names for the client (old method)
-                agent_names_resp = self.get_supabase_client().table('client_language_agent_name').select('language_id, agent_name').eq('client_id', client_id).execute()
-                if agent_names_resp.data:
-                    for agent_record in agent_names_resp.data:
-                        agent_language_id = agent_record.get('language_id')
-                        agent_name = agent_record.get('agent_name')
-                        if agent_language_id and agent_name:
-                            # Get language code for the key
-                            lang_resp = self.get_supabase_client().table('language').select('language_code').eq('id', agent_language_id).limit(1).execute()
-                            if lang_resp.data:
-                                lang_code = lang_resp.data[0].get('language_code', 'en')
-                                dynamic_variables[f'agent_name_{lang_code}'] = agent_name
+            # Step 2: Get client information, configuration, agent names and call records.
+            # These only depend on the twilio_number row, so run them concurrently.
+            # The per-client variables are reused from the shared cache for repeat numbers.
+            client_variables_future = _lookup_pool.submit(get_client_dynamic_variables, client_id,
+                                                          client_ivr_language_configuration_id)
+            retell_event_future = _lookup_pool.submit(self._create_retell_event, from_number, to_number)
+            caller_future = _lookup_pool.submit(get_or_create_caller, from_number)
+
+            dynamic_variables: Dict[str, Any] = client_variables_future.result()
 
             # Add basic call information
             dynamic_variables['caller_number'] = from_number
@@ -191,27 +225,19 @@ class VoiceWebhookService:
             dynamic_variables['call_type'] = 'inbound'
             dynamic_variables['source'] = 'twilio_webhook'
 
-            # Create retell_event record and get caller_id for the call_started webhook
-            retell_event_data = {
-                'from_number': from_number,
-                'to_number': to_number,
-                'agent_id': 'pending',  # Will be updated by call_started webhook
-                'call_status': 'inbound',  # Initial status
-                'direction': 'inbound'
-            }
-            
-            retell_response = self.get_supabase_client().table('retell_event').insert(retell_event_data).execute()
+            # Created retell_event record and caller_id for the call_started webhook
+            retell_response = retell_event_future.result()
             if hasattr(retell_response, 'error') and retell_response.error:
-                logger.error(f"Error creating retell_event record: {retell_response.error}")
+                logger.error("Error creating retell_event record: %s", retell_response.error)
                 return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
             
             retell_event_id = retell_response.data[0]['id'] if retell_response.data else None
-            logger.info(f"Created retell_event record with ID: {retell_event_id}")
+            logger.info("Created retell_event record with ID: %s", retell_event_id)
             
             # Get or create caller record
-            caller_id = self._get_or_create_caller(from_number)
+            caller_id = caller_future.result()
             if not caller_id:
-                logger.error(f"Failed to get or create caller for: {from_number}")
+                logger.error("Failed to get or create caller for: %s", from_number)
                 return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
             
             # Create original twilio_call record (Media Stream CallSid) for transcription
@@ -226,10 +252,10 @@ class VoiceWebhookService:
             
             original_twilio_response = self.get_supabase_client().table('twilio_call').insert(original_twilio_call_data).execute()
             if hasattr(original_twilio_response, 'error') and original_twilio_response.error:
-                logger.error(f"Error creating original twilio_call record: {original_twilio_response.error}")
+                logger.error("Error creating original twilio_call record: %s", original_twilio_response.error)
             else:
                 original_twilio_call_id = original_twilio_response.data[0]['id'] if original_twilio_response.data else None
-                logger.info(f"Created original twilio_call record with ID: {original_twilio_call_id} for Media Stream CallSid: {original_call_sid}")
+                logger.info("Created original twilio_call record with ID: %s for Media Stream CallSid: %s", original_twilio_call_id, original_call_sid)
             
             # Add retell_event_id, caller_id, original_call_sid, and original_twilio_call_id to dynamic variables
             dynamic_variables['retell_event_id'] = retell_event_id
@@ -237,71 +263,35 @@ class VoiceWebhookService:
             dynamic_variables['original_call_sid'] = original_call_sid  # Media Stream CallSid
             dynamic_variables['original_twilio_call_id'] = original_twilio_call_id  # ID of the original record
 
-            logger.info(f"Dynamic variables built successfully: {list(dynamic_variables.keys())}")
+            logger.info("Dynamic variables built successfully: %s", list(dynamic_variables.keys()))
             return dynamic_variables
 
         except Exception as e:
-            logger.error(f"Error getting dynamic variables: {e}")
+            logger.error("Error getting dynamic variables: %s", e)
             return self._get_default_dynamic_variables(from_number, to_number, original_call_sid)
 
-    def _get_or_create_caller(self, from_number: str) -> Optional[str]:
-        """
-        Get or create caller record in Supabase
-        """
-        try:
-            # Check if caller already exists
-            caller_resp = self.get_supabase_client().table('caller').select('id').eq('phone_number', from_number).limit(1).execute()
-            
-            if caller_resp.data:
-                caller_id = caller_resp.data[0].get('id')
-                logger.info(f"Found existing caller with ID: {caller_id}")
-                return caller_id
-            
-            # Create new caller record
-            caller_data = {
-                'phone_number': from_number,
-                'name': f"Caller from {from_number}",
-                'email': None,
-                'address': None
-            }
-            
-            new_caller_resp = self.get_supabase_client().table('caller').insert(caller_data).execute()
-            if hasattr(new_caller_resp, 'error') and new_caller_resp.error:
-                logger.error(f"Error creating caller record: {new_caller_resp.error}")
-                return None
-            
-            new_caller_id = new_caller_resp.data[0]['id'] if new_caller_resp.data else None
-            logger.info(f"Created new caller with ID: {new_caller_id}")
-            return new_caller_id
-            
-        except Exception as e:
-            logger.error(f"Error in _get_or_create_caller: {e}")
-            return None
-
     def _get_default_dynamic_variables(self, from_number: str, to_number: str, original_call_sid: str) -> Dict[str, Any]:
         """
         Get default dynamic variables when customer lookup fails
         """
         logger.info("Using default dynamic variables for unknown customer")
         return {
-            'customer_name': 'Valued Customer',
-            'customer_id': 'unknown',
-            'account_type': 'standard',
-            'client_name': 'Our Company',
-            'caller_number': from_number,
-            'callee_number': to_number,
+            **DEFAULT_DYNAMIC_VARIABLES,
             'call_type': 'inbound',
             'source': 'twilio_webhook',
+            'caller_number': from_number,
+            'callee_number': to_number,
             'original_call_sid': original_call_sid
         }
 
-    def register_phone_call_with_retell(self, agent_id: str, from_number: str, to_number: str, original_call_sid: str) -> Optional[str]:
+    def register_phone_call_with_retell(self, agent_id: str, from_number: str, to_number: str, original_call_sid: str,
+                                        twilio_number_row: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """
         Register phone call with Retell AI and return call_id
         """
         try:
             # Get dynamic variables using the same chain as call_inbound webhook
-            dynamic_variables = self._get_dynamic_variables_from_supabase(to_number, from_number, original_call_sid)
+            dynamic_variables = self._get_dynamic_variables_from_supabase(to_number, from_number, original_call_sid, twilio_number_row)
             
             # Prepare request payload
             payload = {
@@ -312,144 +302,151 @@ class VoiceWebhookService:
                 "retell_llm_dynamic_variables": dynamic_variables
             }
             
-            headers = {"Authorization": f"Bearer {self.retell_api_key}"}
+            headers = {"Authorization": f"Bearer {self.retell_api_key}", "Content-Type": "application/json"}
             
-            # Log the request details
-            logger.info("=== RETELL API REGISTRATION REQUEST ===")
-            logger.info(f"URL: https://api.retellai.com/v2/register-phone-call")
-            logger.info(f"Headers: {headers}")
-            logger.info(f"Payload: {payload}")
-            logger.info("=== END RETELL API REQUEST ===")
+            # Full request only at DEBUG (never log the Authorization header)
+            logger.debug("Retell register-phone-call request to %s: %s", RETELL_REGISTER_URL, payload)
             
-            resp = requests.post(
-                "https://api.retellai.com/v2/register-phone-call",
-                json=payload,
+            resp = _retell_session.post(
+                RETELL_REGISTER_URL,
+                data=orjson.dumps(payload),  # orjson instead of requests' stdlib json encoding
                 headers=headers,
-                timeout=30,
+                timeout=(3, 30),
             )
             
-            # Log the response
-            logger.info("=== RETELL API RESPONSE ===")
-            logger.info(f"Status Code: {resp.status_code}")
-            logger.info(f"Response Headers: {dict(resp.headers)}")
-            logger.info(f"Response Body: {resp.text}")
-            logger.info("=== END RETELL API RESPONSE ===")
+            logger.info("Retell register-phone-call response status: %s", resp.status_code)
+            logger.debug("Retell register-phone-call response headers: %s | body: %s", resp.headers, resp.text)
             
             if resp.status_code not in (200, 201):
-                logger.error(f"Retell API error: {resp.status_code} - {resp.text}")
+                logger.error("Retell API error: %s - %s", resp.status_code, resp.text)
                 return None
 
-            call_id = resp.json().get("call_id")
+            call_id = orjson.loads(resp.content).get("call_id")
             if not call_id:
                 logger.error("No call_id returned from Retell API")
                 return None
 
-            logger.info(f"Successfully registered Retell call_id={call_id}")
+            logger.info("Successfully registered Retell call_id=%s", call_id)
             return call_id
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Request error registering call with Retell: {e}")
+            logger.error("Request error registering call with Retell: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Error registering call with Retell: {e}")
+            logger.error("Error registering call with Retell: %s", e)
             return None
 
-    def generate_twiml_response(self, call_id: str) -> str:
+    def _build_twiml(self, call_id: str) -> str:
         """
         TwiML:
           1) Start Media Stream for INBOUND (caller) 
           2) Dial Retell with Media Stream for OUTBOUND (agent)
         """
-        try:
-            vr = VoiceResponse()
-
-            # 1) Caller leg (inbound) BEFORE the bridge
-            start_in = Start()
-            start_in.stream(
-                url=f"wss://{self.public_hostname}/transcription/stream?track=inbound",
-                track="inbound_track"   # <-- REQUIRED
-            )
-            vr.append(start_in)
-
-            # 2) Bridge to Retell — key flags here:
-            dial = Dial(answer_on_bridge=True)  # <-- prevents early-media weirdness
-            sip_url = f"sip:{call_id}@5t4n6j0wnrl.sip.livekit.cloud;transport=tls"  # <-- prefer TLS/SRTP
-            dial.sip(sip_url)
-
-            # 3) Agent leg (outbound) INSIDE <Dial> AFTER <Sip>
-            start_out = Start()
-            start_out.stream(
-                url=f"wss://{self.public_hostname}/transcription/stream?track=outbound",
-                track="outbound_track"  # <-- REQUIRED
-            )
-            dial.append(start_out)
+        vr = VoiceResponse()
 
-            logger.info(f"Dialing Retell SIP: {sip_url}")
-            vr.append(dial)
+        # 1) Caller leg (inbound) BEFORE the bridge
+        start_in = Start()
+        start_in.stream(
+            url=f"wss://{self.public_hostname}/transcription/stream?track=inbound",
+            track="inbound_track"   # <-- REQUIRED
+        )
+        vr.append(start_in)
+
+        # 2) Bridge to Retell — key flags here:
+        dial = Dial(answer_on_bridge=True)  # <-- prevents early-media weirdness
+        sip_url = f"sip:{call_id}@{RETELL_SIP_DOMAIN};transport=tls"  # <-- prefer TLS/SRTP
+        dial.sip(sip_url)
+
+        # 3) Agent leg (outbound) INSIDE <Dial> AFTER <Sip>
+        start_out = Start()
+        start_out.stream(
+            url=f"wss://{self.public_hostname}/transcription/stream?track=outbound",
+            track="outbound_track"  # <-- REQUIRED
+        )
+        dial.append(start_out)
 
-            return str(vr)
+        vr.append(dial)
+        return str(vr)
 
-        except Exception as e:
-            logger.error(f"Error generating TwiML: {e}")
-            fallback = VoiceResponse()
-            fallback.say("Sorry, there was an error processing your call.")
-            return str(fallback)
+    def generate_twiml_response(self, call_id: str) -> str:
+        """
+        Fill the prebuilt TwiML template (see _build_twiml) with the Retell call_id
+        """
+        logger.info("Dialing Retell SIP: sip:%s@%s;transport=tls", call_id, RETELL_SIP_DOMAIN)
+        return f"{self._twiml_head}{escape(call_id)}{self._twiml_tail}"
 
 # Initialize service
 voice_service = VoiceWebhookService()
 
+def _is_valid_twilio_request(form) -> bool:
+    """Check X-Twilio-Signature against the public URL Twilio called (not the proxied one)"""
+    url = f"https://{voice_service.public_hostname}{request.path}"
+    if request.query_string:
+        url = f"{url}?{request.query_string.decode()}"
+    return is_valid_twilio_signature(
+        _TWILIO_SIGNING_KEY,
+        url,
+        form.to_dict(flat=False),
+        request.headers.get("X-Twilio-Signature", ""),
+    )
+
 @voice_bp.route("/voice-webhook", methods=["POST"])
 def voice_webhook():
     """Handle incoming voice webhooks from Twilio"""
     try:
-        # Twilio form payload
-        from_number = request.form.get("From")
-        to_number = request.form.get("To")
-        original_call_sid = request.form.get("CallSid")  # This is the Media Stream CallSid
+        # Twilio form payload (parsed once, then read from the local)
+        form = request.form
+
+        if Config.TWILIO_VALIDATE_SIGNATURES and not _is_valid_twilio_request(form):
+            logger.warning("Rejected /voice-webhook request with invalid X-Twilio-Signature")
+            return Response("Invalid signature", status=403)
+
+        from_number = form.get("From")
+        to_number = form.get("To")
+        original_call_sid = form.get("CallSid")  # This is the Media Stream CallSid
 
-        logger.info(f"/voice-webhook payload: {dict(request.form)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("/voice-webhook payload: %s", form.to_dict())
 
         if not from_number or not to_number:
             logger.error("Missing From/To")
             return Response(
-                '<?xml version="1.0" encoding="UTF-8"?><Response><Say>Invalid request parameters</Say></Response>',
+                _TWIML_INVALID_REQUEST,
                 mimetype="text/xml",
                 status=400,
             )
 
-        # 1) Resolve Retell agent via Supabase chain
-        agent_id = voice_service.get_agent_id_from_supabase(to_number)
+        # 1) Resolve the called number once, then the Retell agent via Supabase chain
+        twilio_number_row = voice_service.get_twilio_number_row(to_number)
+        agent_id = voice_service.get_agent_id_from_supabase(to_number, twilio_number_row) if twilio_number_row else None
         if not agent_id:
-            logger.error(f"No agent configured for To={to_number}")
+            logger.error("No agent configured for To=%s", to_number)
             return Response(
-                '<?xml version="1.0" encoding="UTF-8"?><Response><Say>Service not available for this number</Say></Response>',
+                _TWIML_NO_SERVICE,
                 mimetype="text/xml",
                 status=400,
             )
 
         # 2) Register call with Retell (returns call_id)
-        call_id = voice_service.register_phone_call_with_retell(agent_id, from_number, to_number, original_call_sid)
+        call_id = voice_service.register_phone_call_with_retell(agent_id, from_number, to_number, original_call_sid, twilio_number_row)
         if not call_id:
             logger.error("Failed to register call with Retell")
             return Response(
-                '<?xml version="1.0" encoding="UTF-8"?><Response><Say>Service temporarily unavailable</Say></Response>',
+                _TWIML_UNAVAILABLE,
                 mimetype="text/xml",
                 status=500,
             )
 
         # 3) Return TwiML: Start Media Stream (stereo) + Dial Retell
         twiml_response = voice_service.generate_twiml_response(call_id)
-        logger.info("=== TWIML RESPONSE ===")
-        logger.info(f"CallSid: {original_call_sid}")
-        logger.info(f"Retell call_id: {call_id}")
-        logger.info(f"TwiML Content: {twiml_response}")
-        logger.info("=== END TWIML RESPONSE ===")
+        logger.info("Returning TwiML for CallSid %s, Retell call_id %s", original_call_sid, call_id)
+        logger.debug("TwiML Content: %s", twiml_response)
         return Response(twiml_response, mimetype="text/xml")
 
     except Exception as e:
-        logger.error(f"Error in /voice-webhook: {e}")
+        logger.error("Error in /voice-webhook: %s", e)
         return Response(
-            '<?xml version="1.0" encoding="UTF-8"?><Response><Say>An error occurred processing your call</Say></Response>',
+            _TWIML_ERROR,
             mimetype="text/xml",
             status=500,
         )
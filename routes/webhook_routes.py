@@ -1,11 +1,13 @@
 """
 Webhook route handlers for Retell AI integration
 """
+import logging
 from flask import Blueprint, request, jsonify
-from datetime import datetime
+from werkzeug.exceptions import HTTPException
+from utils.time_utils import utc_timestamp
 from utils.logger import get_logger
 from utils.validators import validate_retell_inbound_webhook
-from services.webhook_service import WebhookService
+from services.webhook_service import webhook_service
 from config import Config
 
 logger = get_logger(__name__)
@@ -13,6 +15,28 @@ logger = get_logger(__name__)
 # Create blueprint
 webhook_bp = Blueprint('webhook', __name__, url_prefix='/webhook')
 
+# 500 response message for each endpoint, used by the blueprint error handler
+_ERROR_MESSAGES = {
+    'webhook.inbound_webhook': 'Internal server error processing webhook',
+    'webhook.business_hours_webhook': 'Internal server error processing business hours check',
+    'webhook.function_test_webhook': 'Internal server error in function test',
+}
+
+@webhook_bp.errorhandler(Exception)
+def handle_webhook_error(e: Exception):
+    """
+    Turn any unhandled exception in a webhook route into a JSON 500
+    
+    HTTP errors raised by Flask itself (e.g. 400 for a malformed body) keep their status.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    logger.error("Error in %s: %s", request.endpoint, e)
+    return jsonify({
+        'error': _ERROR_MESSAGES.get(request.endpoint, 'Internal server error'),
+        'timestamp': utc_timestamp()
+    }), 500
+
 @webhook_bp.route('/inbound', methods=['POST'])
 def inbound_webhook():
     """
@@ -32,52 +56,38 @@ def inbound_webhook():
     Returns:
         JSON response with dynamic variables and metadata
     """
+    # Parse once; a missing or malformed body falls through to the 400 below
+    data = request.get_json(silent=True)
+    
+    # Full payload and headers only at DEBUG (they are large and logged on every call)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Inbound webhook payload: %s | headers: %s", data, dict(request.headers))
+    
+    if not data:
+        logger.error("No JSON data received in webhook")
+        return jsonify({
+            'error': 'No JSON data received',
+            'timestamp': utc_timestamp()
+        }), 400
+    
+    # Validate the webhook data
     try:
-        # Get request data
-        data = request.get_json()
-        
-        # Log the full webhook payload
-        logger.info(f"=== INBOUND WEBHOOK PAYLOAD ===")
-        logger.info(f"Full payload: {data}")
-        logger.info(f"Headers: {dict(request.headers)}")
-        logger.info(f"=== END PAYLOAD ===")
-        
-        if not data:
-            logger.error("No JSON data received in webhook")
-            return jsonify({
-                'error': 'No JSON data received',
-                'timestamp': datetime.now().isoformat()
-            }), 400
-        
-        # Validate the webhook data
-        try:
-            validate_retell_inbound_webhook(data)
-        except ValueError as e:
-            logger.error(f"Webhook validation failed: {e}")
-            return jsonify({
-                'error': f'Invalid webhook data: {str(e)}',
-                'timestamp': datetime.now().isoformat()
-            }), 400
-        
-        # Process the webhook
-        webhook_service = WebhookService()
-        response_data = webhook_service.process_inbound_webhook(data)
-        
-        # Log the response we're sending back
-        logger.info(f"=== WEBHOOK RESPONSE ===")
-        logger.info(f"Response data: {response_data}")
-        logger.info(f"=== END RESPONSE ===")
-        
-        logger.info(f"Inbound webhook processed successfully for call from {data.get('call_inbound', {}).get('from_number', 'unknown')}")
-        
-        return jsonify(response_data), 200
-        
-    except Exception as e:
-        logger.error(f"Error processing inbound webhook: {e}")
+        validate_retell_inbound_webhook(data)
+    except ValueError as e:
+        logger.error("Webhook validation failed: %s", e)
         return jsonify({
-            'error': 'Internal server error processing webhook',
-            'timestamp': datetime.now().isoformat()
-        }), 500
+            'error': f'Invalid webhook data: {str(e)}',
+            'timestamp': utc_timestamp()
+        }), 400
+    
+    # Process the webhook
+    response_data = webhook_service.process_inbound_webhook(data)
+    
+    # Log the response we're sending back
+    logger.debug("Inbound webhook response: %s", response_data)
+    logger.info("Inbound webhook processed successfully for call from %s", (data.get('call_inbound') or {}).get('from_number', 'unknown'))
+    
+    return jsonify(response_data), 200
 
 @webhook_bp.route('/business-hours', methods=['POST'])
 def business_hours_webhook():
@@ -95,49 +105,35 @@ def business_hours_webhook():
     Returns:
         JSON response with within_business_hours status
     """
-    try:
-        # Get request data
-        data = request.get_json()
-        
-        # Log the full webhook payload
-        logger.info(f"=== BUSINESS HOURS WEBHOOK PAYLOAD ===")
-        logger.info(f"Full payload: {data}")
-        logger.info(f"Headers: {dict(request.headers)}")
-        logger.info(f"=== END PAYLOAD ===")
-        
-        if not data:
-            logger.error("No JSON data received in business hours webhook")
-            return jsonify({
-                'error': 'No JSON data received',
-                'timestamp': datetime.now().isoformat()
-            }), 400
-        
-        # Process the business hours check
-        webhook_service = WebhookService()
-        response_data = webhook_service.process_business_hours_check(data)
-        
-        # Log the response we're sending back
-        logger.info(f"=== BUSINESS HOURS RESPONSE ===")
-        logger.info(f"Response data: {response_data}")
-        logger.info(f"=== END RESPONSE ===")
-        
-        logger.info(f"Business hours check processed successfully for client_id: {data.get('args', {}).get('client_id', 'unknown')}")
-        
-        return jsonify(response_data), 200
-        
-    except Exception as e:
-        logger.error(f"Error processing business hours webhook: {e}")
+    # Parse once; a missing or malformed body falls through to the 400 below
+    data = request.get_json(silent=True)
+    
+    # Full payload and headers only at DEBUG (they are large and logged on every call)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Business hours webhook payload: %s | headers: %s", data, dict(request.headers))
+    
+    if not data:
+        logger.error("No JSON data received in business hours webhook")
         return jsonify({
-            'error': 'Internal server error processing business hours check',
-            'timestamp': datetime.now().isoformat()
-        }), 500
+            'error': 'No JSON data received',
+            'timestamp': utc_timestamp()
+        }), 400
+    
+    # Process the business hours check
+    response_data = webhook_service.process_business_hours_check(data)
+    
+    # Log the response we're sending back
+    logger.debug("Business hours response: %s", response_data)
+    logger.info("Business hours check processed successfully for client_id: %s", (data.get('args') or {}).get('client_id', 'unknown'))
+    
+    return jsonify(response_data), 200
 
 @webhook_bp.route('/test', methods=['GET'])
 def webhook_test():
     """Test endpoint to verify webhook routes are working"""
     return jsonify({
         'status': 'webhook routes active',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': utc_timestamp(),
         'endpoints': {
             'inbound': '/webhook/inbound (POST)',
             'business_hours': '/webhook/business-hours (POST)',
@@ -154,37 +150,28 @@ def function_test_webhook():
     This endpoint will log everything it receives and return a simple response.
     Use this to debug Retell function calls.
     """
-    try:
-        # Get request data
-        data = request.get_json()
-        
-        # Log everything we receive
-        logger.info(f"=== FUNCTION TEST WEBHOOK PAYLOAD ===")
-        logger.info(f"Full payload: {data}")
-        logger.info(f"Headers: {dict(request.headers)}")
-        logger.info(f"Content-Type: {request.content_type}")
-        logger.info(f"Method: {request.method}")
-        logger.info(f"URL: {request.url}")
-        logger.info(f"=== END FUNCTION TEST PAYLOAD ===")
-        
-        # Return a simple response
-        response_data = {
-            'status': 'function_test_received',
-            'timestamp': datetime.now().isoformat(),
-            'received_data': data,
-            'message': 'Function call payload logged successfully'
-        }
-        
-        logger.info(f"=== FUNCTION TEST RESPONSE ===")
-        logger.info(f"Response data: {response_data}")
-        logger.info(f"=== END FUNCTION TEST RESPONSE ===")
-        
-        return jsonify(response_data), 200
-        
-    except Exception as e:
-        logger.error(f"Error in function test webhook: {e}")
-        return jsonify({
-            'error': 'Internal server error in function test',
-            'timestamp': datetime.now().isoformat(),
-            'exception': str(e)
-        }), 500
+    # Get request data
+    data = request.get_json()
+    
+    # Log everything we receive
+    logger.info("=== FUNCTION TEST WEBHOOK PAYLOAD ===")
+    logger.info("Full payload: %s", data)
+    logger.info("Headers: %s", dict(request.headers))
+    logger.info("Content-Type: %s", request.content_type)
+    logger.info("Method: %s", request.method)
+    logger.info("URL: %s", request.url)
+    logger.info("=== END FUNCTION TEST PAYLOAD ===")
+    
+    # Return a simple response
+    response_data = {
+        'status': 'function_test_received',
+        'timestamp': utc_timestamp(),
+        'received_data': data,
+        'message': 'Function call payload logged successfully'
+    }
+    
+    logger.info("=== FUNCTION TEST RESPONSE ===")
+    logger.info("Response data: %s", response_data)
+    logger.info("=== END FUNCTION TEST RESPONSE ===")
+    
+    return jsonify(response_data), 200
@@ -0,0 +1,66 @@
+"""
+Caller records shared by the Twilio voice webhook and the Retell inbound webhook
+"""
+from typing import Optional
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.supabase_client import get_supabase_client, fetch_one
+from utils.validators import normalize_phone_number
+
+logger = get_logger(__name__)
+
+# Caller ids by normalized phone number, shared by every inbound path in this process
+# (callers are never re-keyed, so repeat callers skip the lookup)
+_caller_id_cache = TTLCache(ttl_seconds=600, maxsize=4096)
+
+def get_or_create_caller(from_number: str) -> Optional[str]:
+    """
+    Get or create a caller record based on from_number
+
+    Args:
+        from_number: The caller's phone number
+
+    Returns:
+        Caller ID (UUID) or None if failed
+    """
+    try:
+        # One canonical form for the cache key, the lookup and new caller rows
+        from_number = normalize_phone_number(from_number)
+        caller_id = _caller_id_cache.get(from_number)
+        if caller_id:
+            logger.info("Found cached caller with ID: %s", caller_id)
+            return caller_id
+
+        supabase = get_supabase_client()
+
+        # First, try to find existing caller
+        caller_row = fetch_one(supabase.table('caller').select('id').eq('phone_number', from_number))
+        if caller_row:
+            caller_id = caller_row.get('id')
+            logger.info("Found existing caller with ID: %s", caller_id)
+            if caller_id:
+                _caller_id_cache.set(from_number, caller_id)
+            return caller_id
+
+        # Caller doesn't exist, create new one
+        logger.info("Creating new caller record for: %s", from_number)
+        new_caller_data = {
+            'phone_number': from_number,
+            'name': f"Caller from {from_number}",
+            'is_customer': 'unknown'  # We don't know yet
+        }
+
+        create_resp = supabase.table('caller').insert(new_caller_data).execute()
+        if hasattr(create_resp, 'error') and create_resp.error:
+            logger.error("Error creating caller record: %s", create_resp.error)
+            return None
+
+        caller_id = create_resp.data[0]['id'] if create_resp.data else None
+        logger.info("Created new caller with ID: %s", caller_id)
+        if caller_id:
+            _caller_id_cache.set(from_number, caller_id)
+        return caller_id
+
+    except Exception as e:
+        logger.error("Error in get_or_create_caller: %s", e)
+        return None
@@ -3,10 +3,10 @@ Deepgram service for audio transcription
 """
 import os
 import tempfile
-import requests
 from typing import Optional, List
 from deepgram import DeepgramClient, PrerecordedOptions, FileSource
 from config import Config
+from utils.http_client import download_session, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -203,18 +203,20 @@ class DeepgramService:
         
         logger.info(f"Downloading remote audio from: {audio_url}")
         try:
-            response = requests.get(audio_url, stream=True, timeout=30)
-            response.raise_for_status()
+            with download_session.get(audio_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
 
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
-                tmp.write(response.content)
-                tmp.flush()
-                return self.transcribe_audio_file(
-                    tmp.name,
-                    model=model,
-                    language=language,
-                    prompt=prompt
-                )
+                with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
+                    # Stream to disk instead of buffering the whole body in memory
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        tmp.write(chunk)
+                    tmp.flush()
+                    return self.transcribe_audio_file(
+                        tmp.name,
+                        model=model,
+                        language=language,
+                        prompt=prompt
+                    )
         except Exception as e:
             logger.error(f"Failed to download or transcribe audio: {e}")
             return None
@@ -0,0 +1,149 @@
+"""
+Retell dynamic variables shared by the Twilio voice webhook and the Retell inbound webhook
+"""
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.supabase_client import get_supabase_client, fetch_one
+
+logger = get_logger(__name__)
+
+# Default variables for unknown customers (read-only; copy with dict() before adding keys)
+DEFAULT_DYNAMIC_VARIABLES = MappingProxyType({
+    'customer_name': 'Valued Customer',
+    'customer_id': 'unknown',
+    'account_type': 'standard',
+    'client_name': 'Our Company'
+})
+
+# client_workflow_configuration columns that are keys, not dynamic variables
+WORKFLOW_EXCLUDED_COLUMNS = frozenset(('id', 'client_id'))
+
+# Agent names with their language code embedded (client_language_agent_name.language_id FK)
+AGENT_NAME_COLUMNS = 'language_id, agent_name, language(language_code)'
+
+# pool for the three per-client queries of get_client_dynamic_variables
+# (its own pool, since callers run it from their lookup pools and wait on these)
+_query_pool = ThreadPoolExecutor(max_workers=16)
+
+# Client info, workflow and agent name variables by (client_id, client_ivr_language_configuration_id),
+# shared by every inbound path in this process. Only clients that were found are cached, so a
+# client row created after a miss is picked up on the next call.
+_client_variables_cache = TTLCache(ttl_seconds=300, maxsize=1024)
+
+def get_client_variables(client_id: str) -> Dict[str, Any]:
+    """
+    Get client basic info as dynamic variables
+
+    Args:
+        client_id: The client UUID
+
+    Returns:
+        Dict with client_id, client_name and client_description (empty if the client is missing)
+    """
+    supabase = get_supabase_client()
+    dynamic_variables: Dict[str, Any] = {}
+    client = fetch_one(supabase.table('client').select('name, client_description').eq('id', client_id))
+    if client:
+        client_name = client.get('name', 'Our Company')
+        client_description = client.get('client_description', '')
+        dynamic_variables['client_id'] = client_id  # Add client_id for function calls
+        dynamic_variables['client_name'] = client_name
+        dynamic_variables['client_description'] = client_description
+        logger.info("Client data - client_id: '%s', name: '%s', description: '%s'", client_id, client_name, client_description)
+    return dynamic_variables
+
+def get_workflow_variables(client_id: str) -> Dict[str, Any]:
+    """
+    Get client workflow configuration as dynamic variables (without workflow_ prefix)
+
+    Args:
+        client_id: The client UUID
+
+    Returns:
+        Dict of non-null workflow configuration columns
+    """
+    supabase = get_supabase_client()
+    dynamic_variables: Dict[str, Any] = {}
+    wf_config = fetch_one(supabase.table('client_workflow_configuration').select('*').eq('client_id', client_id))
+    if wf_config:
+        logger.info("Workflow config raw data: %s", wf_config)
+        for key, value in wf_config.items():
+            if key not in WORKFLOW_EXCLUDED_COLUMNS and value is not None:
+                dynamic_variables[key] = value
+                logger.info("Added %s: '%s'", key, value)
+    return dynamic_variables
+
+def get_agent_name_variables(client_id: str, client_ivr_language_configuration_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Get client language agent names as agent_name_<lang> dynamic variables
+
+    Args:
+        client_id: The client UUID
+        client_ivr_language_configuration_id: IVR language configuration of the called number (optional)
+
+    Returns:
+        Dict of agent_name_<language_code> entries
+    """
+    supabase = get_supabase_client()
+    dynamic_variables: Dict[str, Any] = {}
+    # Language codes are embedded through the client_language_agent_name.language_id
+    # foreign key (no per-language lookups)
+    agent_names_query = supabase.table('client_language_agent_name').select(AGENT_NAME_COLUMNS).eq('client_id', client_id)
+    if client_ivr_language_configuration_id:
+        # Only the languages in this client's IVR configuration, fetched in one query
+        ivr_lang_resp = supabase.table('client_ivr_language_configuration_language').select(
+            'language_id'
+        ).eq('client_id', client_id).eq('client_ivr_language_configuration_id', client_ivr_language_configuration_id).execute()
+        language_ids = [record['language_id'] for record in ivr_lang_resp.data or [] if record.get('language_id')]
+        agent_records = []
+        if language_ids:
+            # First agent name per language, kept in IVR configuration order
+            first_by_language: Dict[str, Dict[str, Any]] = {}
+            for record in agent_names_query.in_('language_id', language_ids).execute().data or []:
+                first_by_language.setdefault(record.get('language_id'), record)
+            agent_records = [first_by_language[language_id] for language_id in language_ids if language_id in first_by_language]
+    else:
+        # Fallback: Get all agent names for the client (old method)
+        agent_records = agent_names_query.execute().data or []
+
+    for agent_record in agent_records:
+        agent_name = agent_record.get('agent_name')
+        language = agent_record.get('language')
+        if agent_name and language:
+            lang_code = language.get('language_code', 'en')
+            dynamic_variables[f'agent_name_{lang_code}'] = agent_name
+            logger.info("Added agent_name_%s: %s", lang_code, agent_name)
+    return dynamic_variables
+
+def get_client_dynamic_variables(client_id: str, client_ivr_language_configuration_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Get the client info, workflow and agent name dynamic variables for a called number
+
+    Args:
+        client_id: The client UUID
+        client_ivr_language_configuration_id: IVR language configuration of the called number (optional)
+
+    Returns:
+        New dict the caller may extend (empty if the client is missing)
+    """
+    cache_key = (client_id, client_ivr_language_configuration_id)
+    cached_variables = _client_variables_cache.get(cache_key)
+    if cached_variables is not None:
+        logger.info("Using cached dynamic variables for client_id: %s", client_id)
+        return dict(cached_variables)
+
+    # The three lookups only depend on client_id, so they run concurrently
+    client_future = _query_pool.submit(get_client_variables, client_id)
+    workflow_future = _query_pool.submit(get_workflow_variables, client_id)
+    agent_names_future = _query_pool.submit(get_agent_name_variables, client_id, client_ivr_language_configuration_id)
+
+    # Merge in the original order so later sources override earlier keys
+    dynamic_variables = client_future.result()
+    dynamic_variables.update(workflow_future.result())
+    dynamic_variables.update(agent_names_future.result())
+    if 'client_id' in dynamic_variables:
+        _client_variables_cache.set(cache_key, dict(dynamic_variables))
+    return dynamic_variables
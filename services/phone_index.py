@@ -0,0 +1,116 @@
+"""
+In-process index of the twilio_number table for fast phone number lookups
+"""
+import threading
+import time
+from typing import Dict, Any, Optional
+from utils.cache import TTLCache
+from utils.logger import get_logger
+from utils.supabase_client import get_supabase_client
+from utils.validators import normalize_phone_number
+
+logger = get_logger(__name__)
+
+# Columns mirrored from twilio_number
+TWILIO_NUMBER_COLUMNS = 'twilio_number, client_id, client_ivr_language_configuration_id'
+
+class PhoneNumberIndex:
+    """Periodically refreshed mirror of twilio_number keyed by phone number
+
+    The table is small and changes rarely, so every inbound call can resolve
+    its number from memory instead of a Supabase round trip. Lookups that
+    miss return None and callers fall back to querying Supabase directly, so
+    numbers added since the last refresh still resolve. Numbers that fallback
+    also missed are remembered for one refresh interval so repeated calls to
+    an unconfigured number don't query Supabase each time.
+    """
+
+    def __init__(self, refresh_seconds: float = 60):
+        """
+        Initialize the index (rows are loaded on first lookup)
+
+        Args:
+            refresh_seconds: How long a snapshot is used before it is reloaded
+        """
+        self.refresh_seconds = refresh_seconds
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._missing = TTLCache(ttl_seconds=refresh_seconds, maxsize=4096)
+
+    def _is_stale(self) -> bool:
+        """Check whether the snapshot needs reloading"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _ensure_fresh(self) -> None:
+        """Reload the snapshot when it is stale (only one thread reloads at a time)"""
+        if not self._is_stale():
+            return
+        # Other threads keep serving the previous snapshot while one reloads it
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._is_stale():
+                self.refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self) -> None:
+        """Reload all twilio_number rows from Supabase"""
+        try:
+            resp = get_supabase_client().table('twilio_number').select(TWILIO_NUMBER_COLUMNS).execute()
+            rows: Dict[str, Dict[str, Any]] = {}
+            for row in resp.data or []:
+                number = row.get('twilio_number')
+                if number:
+                    # Index both the stored and the normalized form
+                    rows[number] = row
+                    rows.setdefault(normalize_phone_number(number), row)
+            self._rows = rows
+            logger.info("Loaded %s twilio_number rows into phone index", len(resp.data or []))
+        except Exception as e:
+            logger.error("Error refreshing phone index: %s", e)
+        # Also set on failure so a Supabase outage doesn't trigger a reload per lookup
+        self._loaded_at = time.monotonic()
+
+    def lookup(self, *numbers: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the twilio_number row for the first matching phone number
+
+        Args:
+            numbers: Phone number variants to try in order (e.g. cleaned, then original)
+
+        Returns:
+            The twilio_number row or None if no variant is indexed
+        """
+        self._ensure_fresh()
+        rows = self._rows
+        for number in numbers:
+            row = rows.get(number)
+            if row is not None:
+                return row
+        return None
+
+    def is_missing(self, *numbers: str) -> bool:
+        """
+        Check whether a Supabase fallback recently found none of these numbers
+
+        Args:
+            numbers: Phone number variants, as passed to mark_missing
+
+        Returns:
+            True if the variants were marked missing within the last refresh interval
+        """
+        return self._missing.get(numbers, False)
+
+    def mark_missing(self, *numbers: str) -> None:
+        """
+        Remember that a Supabase fallback found none of these numbers
+
+        Args:
+            numbers: Phone number variants that were queried
+        """
+        self._missing.set(numbers, True)
+
+# Global instance
+phone_index = PhoneNumberIndex()
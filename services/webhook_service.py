@@ -2,50 +2,172 @@
 Webhook service utilities
 """
 import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from types import MappingProxyType
 from typing import Dict, Any, Optional, List
-from datetime import datetime
-import pytz
-from supabase import create_client
+from datetime import time
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from postgrest.types import CountMethod, ReturnMethod
 from twilio.rest import Client
 from config import Config
+from utils.cache import TTLCache
 from utils.logger import get_logger
+from utils.retry import retry_db
+from utils.supabase_client import get_supabase_client, fetch_one
+from utils.time_utils import utc_now, utc_timestamp
+from utils.validators import normalize_phone_number
+from services.callers import get_or_create_caller
+from services.dynamic_variables import DEFAULT_DYNAMIC_VARIABLES, get_client_dynamic_variables
+from services.phone_index import phone_index
 
 logger = get_logger(__name__)
 
+# shared thread pool for I/O-bound Supabase lookups
+_lookup_pool = ThreadPoolExecutor(max_workers=8)
+
+# single background worker so call lifecycle events are persisted in arrival order.
+# This is per process: deliveries for one call can reach different gunicorn workers,
+# and events still queued are lost if the worker restarts or crashes. What keeps a
+# redelivered or reordered event from rewriting a row across workers is the
+# call_status guard in _update_retell_event_by_call_id.
+_event_pool = ThreadPoolExecutor(max_workers=1)
+
+# Twilio call details fetched recently, keyed by call SID (absorbs webhook retries)
+_twilio_call_cache = TTLCache(ttl_seconds=30, maxsize=256)
+
+# Lifecycle events already queued, keyed by (event, call_id), so Retell retries are not processed twice.
+# Per worker process: a retry that reaches another worker is not deduplicated here. The key is
+# removed again if the handler fails, so a retry of a failed event is processed.
+_seen_events = TTLCache(ttl_seconds=600, maxsize=10000)
+
+# Lowercase weekday names indexed by datetime.weekday(), and their day_order numbers (1=monday, 7=sunday)
+_WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+_WEEKDAY_NUMBERS = {day: number for number, day in enumerate(_WEEKDAYS, start=1)}
+
+# Business hours answers keyed by (client_id, UTC minute)
+_business_hours_cache = TTLCache(ttl_seconds=60, maxsize=1024)
+
+# Shared read-only fallback for missing nested payload objects
+_EMPTY = MappingProxyType({})
+
+# Function names Retell may use for the business hours check
+_BUSINESS_HOURS_FUNCTIONS = frozenset(('siftly_check_business_hours', 'check_business_hours'))
+
+# Client timezone plus opening hours, fetched with one embedded select
+_BUSINESS_HOURS_COLUMNS = (
+    'timezone(name), '
+    'opening_hours(day, day_order, start_time, end_time, break_start_time, break_end_time)'
+)
+
+# (column, default) pairs copied from the call_started payload into retell_event
+_CALL_STARTED_FIELDS = (
+    ('call_id', ''),
+    ('call_type', ''),
+    ('agent_id', ''),
+    ('call_status', ''),
+    ('direction', ''),
+)
+
+# (column, default) pairs copied from the call_ended payload into retell_event
+_CALL_ENDED_FIELDS = (
+    ('call_status', ''),
+    ('end_timestamp', ''),
+    ('disconnection_reason', ''),
+    ('transcript', ''),
+    ('transcript_object', ''),
+    ('transcript_with_tool_calls', ''),
+    ('recording_url', ''),
+    ('opt_out_sensitive_data_storage', False),
+)
+
+# (column, default) pairs copied from call.call_analysis into retell_event
+_CALL_ANALYSIS_FIELDS = (
+    ('call_summary', ''),
+    ('in_voicemail', False),
+    ('user_sentiment', ''),
+    ('call_successful', False),
+    ('custom_analysis_data', {}),
+)
+
+# Transcript step types that carry speech, mapped to their node transcript label
+_SPEAKER_LABELS = {'agent': 'Agent', 'user': 'User'}
+
+@lru_cache(maxsize=256)
+def _parse_time(value: Any) -> time:
+    """
+    Parse an opening hours time value (e.g. '09:00' or '09:00:00' from a Postgres time column)
+    
+    Args:
+        value: Time string or time object
+    
+    Returns:
+        Parsed time object
+    """
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value))
+
+def _extract_fields(source: Dict[str, Any], fields: tuple) -> Dict[str, Any]:
+    """
+    Copy the given fields out of a payload in one pass, skipping None values
+
+    Args:
+        source: Payload dict to read from
+        fields: Tuple of (key, default) pairs
+
+    Returns:
+        Dict of extracted values (None values are dropped to avoid overwriting with null)
+    """
+    extracted = {}
+    get = source.get
+    for key, default in fields:
+        value = get(key, default)
+        if value is not None:
+            extracted[key] = value
+    return extracted
+
 class WebhookService:
     """Service class for processing webhooks"""
     
+    __slots__ = ('_twilio_client', '_client_lock', '_event_handlers')
+    
     def __init__(self):
         """Initialize webhook service"""
-        self._supabase_client = None
         self._twilio_client = None
+        self._client_lock = threading.Lock()
+        # Background handlers for Retell call lifecycle events
+        self._event_handlers = {
+            'call_started': self._handle_call_started_event,    # create database records
+            'call_ended': self._handle_call_ended_event,        # update existing retell_event record
+            'call_analyzed': self._handle_call_analyzed_event,  # add analysis and Twilio call details
+        }
 
     @property
     def supabase(self):
-        """Lazy-init Supabase client"""
-        if self._supabase_client is None:
-            try:
-                self._supabase_client = create_client(
-                    Config.SUPABASE_URL,
-                    Config.SUPABASE_SERVICE_ROLE_KEY
-                )
-            except Exception as e:
-                logger.error(f"Could not initialize Supabase client: {e}")
-                raise
-        return self._supabase_client
+        """Shared Supabase client"""
+        try:
+            return get_supabase_client()
+        except Exception as e:
+            logger.error("Could not initialize Supabase client: %s", e)
+            raise
 
     @property
     def twilio(self):
         """Lazy-init Twilio client"""
         if self._twilio_client is None:
-            try:
-                self._twilio_client = Client(
-                    Config.TWILIO_ACCOUNT_SID,
-                    Config.TWILIO_AUTH_TOKEN
-                )
-            except Exception as e:
-                logger.error(f"Could not initialize Twilio client: {e}")
-                raise
+            with self._client_lock:
+                if self._twilio_client is None:
+                    try:
+                        self._twilio_client = Client(
+                            Config.TWILIO_ACCOUNT_SID,
+                            Config.TWILIO_AUTH_TOKEN
+                        )
+                    except Exception as e:
+                        logger.error("Could not initialize Twilio client: %s", e)
+                        raise
         return self._twilio_client
 
     def process_business_hours_check(self, data: Dict[str, Any]) -> Dict[str, str]:
@@ -61,12 +183,12 @@ class WebhookService:
         try:
             # Step 1: Parse the incoming request
             function_name = data.get('name', '')
-            if function_name not in ['siftly_check_business_hours', 'check_business_hours']:
+            if function_name not in _BUSINESS_HOURS_FUNCTIONS:
                 raise ValueError(f"Invalid function name: {function_name}")
             
             # Extract client_id from args or call
-            args = data.get('args', {})
-            call_data = data.get('call', {})
+            args = data.get('args') or _EMPTY
+            call_data = data.get('call') or _EMPTY
             client_id = args.get('client_id') or call_data.get('client_id')
             
             if not client_id:
@@ -74,29 +196,35 @@ class WebhookService:
             
     
             
-            # Step 2: Get the current server time
-            current_utc_time = datetime.utcnow()
+            # Step 2: Get the current server time, snapped to the minute
+            # (business hours are compared at minute precision, so the answer is stable within a minute)
+            current_utc_time = utc_now().replace(second=0, microsecond=0)
+            cache_key = (client_id, current_utc_time)
+            cached_result = _business_hours_cache.get(cache_key)
+            if cached_result is not None:
+                logger.info("Using cached business hours result for client_id: %s", client_id)
+                return dict(cached_result)
     
             
             # Step 3: Look up the client in Supabase
             client_data = self._get_client_business_hours(client_id)
             if not client_data:
-                logger.warning(f"Client not found or no business hours configured for client_id: {client_id}")
+                logger.warning("Client not found or no business hours configured for client_id: %s", client_id)
                 return {"within_business_hours": "0"}
             
             timezone_str = client_data.get('timezone')
             opening_hours = client_data.get('opening_hours', [])
             
             # Debug logging
-            logger.info(f"Timezone field type: {type(timezone_str)}, value: {timezone_str}")
-            logger.info(f"Opening hours count: {len(opening_hours)}")
+            logger.info("Timezone field type: %s, value: %s", type(timezone_str), timezone_str)
+            logger.info("Opening hours count: %s", len(opening_hours))
             
             if not timezone_str:
-                logger.warning(f"No timezone configured for client_id: {client_id}")
+                logger.warning("No timezone configured for client_id: %s", client_id)
                 return {"within_business_hours": "0"}
             
             if not opening_hours:
-                logger.warning(f"No opening hours configured for client_id: {client_id}")
+                logger.warning("No opening hours configured for client_id: %s", client_id)
                 return {"within_business_hours": "0"}
             
             # Step 4: Convert to client's timezone and evaluate business hours
@@ -107,34 +235,36 @@ class WebhookService:
     
                 
                 if not timezone_str:
-                    logger.warning(f"No valid timezone found for client_id: {client_id}")
+                    logger.warning("No valid timezone found for client_id: %s", client_id)
                     return {"within_business_hours": "0"}
                 
-                client_tz = pytz.timezone(timezone_str)
-                client_local_time = current_utc_time.replace(tzinfo=pytz.UTC).astimezone(client_tz)
+                client_tz = ZoneInfo(timezone_str)
+                client_local_time = current_utc_time.astimezone(client_tz)
 
                 
-                # Get current weekday (lowercase)
-                current_weekday = client_local_time.strftime('%A').lower()
-                current_time_str = client_local_time.strftime('%H:%M')
+                # Get current weekday (lowercase); indexing avoids strftime's locale-dependent names
+                current_weekday = _WEEKDAYS[client_local_time.weekday()]
+                # Local wall-clock time at minute precision (current_utc_time has no seconds)
+                current_time = client_local_time.time()
                 
 
                 
                 # Step 5: Check if within business hours
                 within_hours = self._check_business_hours(
-                    opening_hours, current_weekday, current_time_str
+                    opening_hours, current_weekday, current_time
                 )
                 
                 result = {"within_business_hours": "true" if within_hours else "false"}
+                _business_hours_cache.set(cache_key, result)
 
-                return result
+                return dict(result)
                 
-            except pytz.exceptions.UnknownTimeZoneError:
-                logger.error(f"Invalid timezone: {timezone_str}")
+            except (ZoneInfoNotFoundError, ValueError):
+                logger.error("Invalid timezone: %s", timezone_str)
                 return {"within_business_hours": "false"}
                 
         except Exception as e:
-            logger.error(f"Error processing business hours check: {e}")
+            logger.error("Error processing business hours check: %s", e)
             return {"within_business_hours": "false"}
 
     def _get_client_business_hours(self, client_id: str) -> Optional[Dict[str, Any]]:
@@ -148,26 +278,21 @@ class WebhookService:
             Dict with 'timezone' and 'opening_hours' list, or None
         """
         try:
-            # 1) Get client's timezone_id
-            client_resp = self.supabase.table('client').select('timezone_id').eq('id', client_id).limit(1).execute()
-            if not client_resp.data:
-                logger.warning(f"Client not found: {client_id}")
+            # 1) Get client's timezone and opening hours in one round trip
+            #    (embedded via the client.timezone_id and opening_hours.client_id foreign keys)
+            client_record = fetch_one(self.supabase.table('client').select(_BUSINESS_HOURS_COLUMNS).eq('id', client_id))
+            if not client_record:
+                logger.warning("Client not found: %s", client_id)
                 return None
-            timezone_id = client_resp.data[0].get('timezone_id')
-            timezone_name = None
-            if timezone_id:
-                tz_resp = self.supabase.table('timezone').select('name').eq('id', timezone_id).limit(1).execute()
-                if tz_resp.data:
-                    timezone_name = tz_resp.data[0].get('name')
+            timezone_name = (client_record.get('timezone') or _EMPTY).get('name')
             if not timezone_name:
-                logger.warning(f"No timezone configured for client: {client_id}")
+                logger.warning("No timezone configured for client: %s", client_id)
                 return None
             
-            # 2) Fetch opening hours for this client
-            oh_resp = self.supabase.table('opening_hours').select('day, day_order, start_time, end_time, break_start_time, break_end_time').eq('client_id', client_id).execute()
-            opening_hours_records = oh_resp.data or []
+            # 2) Opening hours for this client
+            opening_hours_records = client_record.get('opening_hours') or []
             if not opening_hours_records:
-                logger.warning(f"No opening hours configured for client: {client_id}")
+                logger.warning("No opening hours configured for client: %s", client_id)
                 return None
             
             return {
@@ -175,17 +300,17 @@ class WebhookService:
                 'opening_hours': opening_hours_records
             }
         except Exception as e:
-            logger.error(f"Error getting client business hours from Supabase: {e}")
+            logger.error("Error getting client business hours from Supabase: %s", e)
             return None
 
-    def _check_business_hours(self, opening_hours: List[Dict[str, Any]], current_weekday: str, current_time_str: str) -> bool:
+    def _check_business_hours(self, opening_hours: List[Dict[str, Any]], current_weekday: str, current_time: time) -> bool:
         """
         Check if current time is within business hours
         
         Args:
             opening_hours: List of opening hours records from Supabase
             current_weekday: Current weekday in lowercase (e.g., 'monday')
-            current_time_str: Current time in HH:MM format (e.g., '14:30')
+            current_time: Current local time (e.g., time(14, 30))
         
         Returns:
             True if within business hours, False otherwise
@@ -193,19 +318,14 @@ class WebhookService:
         try:
             # Find the opening hours record for the current weekday
             current_day_hours = None
+            # Current weekday as day_order number (1=monday, 7=sunday)
+            current_day_number = _WEEKDAY_NUMBERS.get(current_weekday)
             
             # Handle both scenarios: single record with list of days, or multiple records with individual days
             for hours_record in opening_hours:
                 day_field = hours_record.get('day', '')
                 day_order_field = hours_record.get('day_order', '')
                 
-                # Convert current weekday to day_order number (1=monday, 7=sunday)
-                weekday_to_number = {
-                    'monday': 1, 'tuesday': 2, 'wednesday': 3, 'thursday': 4,
-                    'friday': 5, 'saturday': 6, 'sunday': 7
-                }
-                current_day_number = weekday_to_number.get(current_weekday)
-                
                 # If day is a list (single record with multiple days)
                 if isinstance(day_field, list):
                     days = [str(d).lower() for d in day_field]
@@ -225,7 +345,7 @@ class WebhookService:
                         break
             
             if not current_day_hours:
-                logger.info(f"No opening hours configured for {current_weekday}")
+                logger.info("No opening hours configured for %s", current_weekday)
                 return False
             
             start_time = current_day_hours.get('start_time')
@@ -234,37 +354,34 @@ class WebhookService:
             break_end_time = current_day_hours.get('break_end_time')
             
             if not start_time or not end_time:
-                logger.warning(f"Incomplete opening hours for {current_weekday}: start={start_time}, end={end_time}")
+                logger.warning("Incomplete opening hours for %s: start=%s, end=%s", current_weekday, start_time, end_time)
                 return False
             
-            logger.info(f"Business hours for {current_weekday}: {start_time} - {end_time}")
+            logger.info("Business hours for %s: %s - %s", current_weekday, start_time, end_time)
             if break_start_time and break_end_time:
-                logger.info(f"Break time for {current_weekday}: {break_start_time} - {break_end_time}")
+                logger.info("Break time for %s: %s - %s", current_weekday, break_start_time, break_end_time)
             
-            # Convert current time string to time object for comparison
+            # Convert opening hours to time objects for comparison (Supabase returns time columns as strings)
             try:
-                from datetime import datetime
-                current_time_obj = datetime.strptime(current_time_str, '%H:%M').time()
-                
                 # Check if within main business hours
-                is_within_hours = start_time <= current_time_obj <= end_time
+                is_within_hours = _parse_time(start_time) <= current_time <= _parse_time(end_time)
                 
                 # If there's a break time, check if we're NOT in break
                 if break_start_time and break_end_time and is_within_hours:
-                    is_in_break = break_start_time <= current_time_obj <= break_end_time
+                    is_in_break = _parse_time(break_start_time) <= current_time <= _parse_time(break_end_time)
                     is_within_hours = not is_in_break
                     if is_in_break:
-                        logger.info(f"Current time {current_time_str} is during break time {break_start_time}-{break_end_time}")
+                        logger.info("Current time %s is during break time %s-%s", current_time, break_start_time, break_end_time)
                 
-                logger.info(f"Current time {current_time_str} within business hours {start_time}-{end_time}: {is_within_hours}")
+                logger.info("Current time %s within business hours %s-%s: %s", current_time, start_time, end_time, is_within_hours)
                 return is_within_hours
                 
             except ValueError as e:
-                logger.error(f"Error parsing time {current_time_str}: {e}")
+                logger.error("Error parsing opening hours for %s: %s", current_weekday, e)
                 return False
             
         except Exception as e:
-            logger.error(f"Error checking business hours: {e}")
+            logger.error("Error checking business hours: %s", e)
             return False
 
   
@@ -279,203 +396,97 @@ class WebhookService:
             Customer data dictionary or None if not found
         """
 
-        logger.info(f"=== SUPABASE LOOKUP START (async) ===")
+        logger.info("=== SUPABASE LOOKUP START (async) ===")
         
         try:
             # Clean phone number by removing spaces and special characters
-            cleaned_number = to_number.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-            logger.info(f"Original number: {to_number}, Cleaned number: {cleaned_number}")
+            cleaned_number = normalize_phone_number(to_number)
+            logger.info("Original number: %s, Cleaned number: %s", to_number, cleaned_number)
             
             # Step 1: Find client via twilio_number (try both original and cleaned)
-            tw_resp = self.supabase.table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', cleaned_number).limit(1).execute()
-            if not tw_resp.data:
-                # Fallback to original number if cleaned doesn't work
-                tw_resp = self.supabase.table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', to_number).limit(1).execute()
-            if not tw_resp.data:
-                logger.warning(f"No twilio_number record found for: {to_number} (cleaned: {cleaned_number})")
-                return None
-            client_id = tw_resp.data[0].get('client_id')
-            client_ivr_language_configuration_id = tw_resp.data[0].get('client_ivr_language_configuration_id')
+            tw_row = phone_index.lookup(cleaned_number, to_number)
+            if tw_row is None:
+                if phone_index.is_missing(cleaned_number, to_number):
+                    logger.warning("No twilio_number record found for: %s (recently checked)", to_number)
+                    return None
+                # Not in the in-memory index yet, query Supabase directly
+                tw_row = fetch_one(self.supabase.table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', cleaned_number))
+                if not tw_row:
+                    # Fallback to original number if cleaned doesn't work
+                    tw_row = fetch_one(self.supabase.table('twilio_number').select('client_id, client_ivr_language_configuration_id').eq('twilio_number', to_number))
+                if not tw_row:
+                    phone_index.mark_missing(cleaned_number, to_number)
+                    logger.warning("No twilio_number record found for: %s (cleaned: %s)", to_number, cleaned_number)
+                    return None
+            client_id = tw_row.get('client_id')
+            client_ivr_language_configuration_id = tw_row.get('client_ivr_language_configuration_id')
             if not client_id:
-                logger.warning(f"twilio_number {to_number} has no client_id")
+                logger.warning("twilio_number %s has no client_id", to_number)
                 return None
 
-            # Step 2: Get client information and configuration
-            dynamic_variables: Dict[str, Any] = {}
-            
-            # Get client basic info
-            client_resp = self.supabase.table('client').select('name, client_description').eq('id', client_id).limit(1).execute()
-            if client_resp.data:
-                client = client_resp.data[0]
-                client_name = client.get('name', 'Our Company')
-                client_description = client.get('client_description', '')
-                dynamic_variables['client_id'] = client_id  # Add client_id for function calls
-                dynamic_variables['client_name'] = client_name
-                dynamic_variables['client_description'] = client_description
-                logger.info(f"Client data - client_id: '{client_id}', name: '{client_name}', description: '{client_description}'")
-
-            # Get client workflow configuration
-            wf_resp = self.supabase.table('client_workflow_configuration').select('*').eq('client_id', client_id).limit(1).execute()
-            if wf_resp.data:
-                wf_config = wf_resp.data[0]
-                logger.info(f"Workflow config raw data: {wf_config}")
-                # Add workflow configuration as dynamic variables (without workflow_ prefix)
-                for key, value in wf_config.items():
-                    if key != 'id' and key != 'client_id' and value is not None:
-                        dynamic_variables[key] = value
-                        logger.info(f"Added {key}: '{value}'")
-
-            # Get client language agent names using the new structure
-            if client_ivr_language_configuration_id:
-                # Get all languages for this client's IVR configuration
-                ivr_lang_resp = self.supabase.table('client_ivr_language_configuration_language').select(
-                    'language_id'
-                ).eq('client_id', client_id).eq('client_ivr_language_configuration_id', client_ivr_language_configuration_id).execute()
-                
-                if ivr_lang_resp.data:
-                    # Get agent names for each language
-                    for lang_record in ivr_lang_resp.data:
-                        language_id = lang_record.get('language_id')
-                        if language_id:
-                            # Get agent name for this language
-                            agent_resp = self.supabase.table('client_language_agent_name').select(
-                                'agent_name'
-                            ).eq('client_id', client_id).eq('language_id', language_id).limit(1).execute()
-                            
-                            if agent_resp.data:
-                                agent_name = agent_resp.data[0].get('agent_name')
-                                if agent_name:
-                                    # Get language code for the key
-                                    lang_resp = self.supabase.table('language').select('language_code').eq('id', language_id).limit(1).execute()
-                                    if lang_resp.data:
-                                        lang_code = lang_resp.data[0].get('language_code', 'en')
-                                        dynamic_variables[f'agent_name_{lang_code}'] = agent_name
-                                        logger.info(f"Added agent_name_{lang_code}: {agent_name}")
-            else:
-                # Fallback: Get all agent names for the client (old method)
-                agent_names_resp = self.supabase.table('client_language_agent_name').select('language_id, agent_name').eq('client_id', client_id).execute()
-                if agent_names_resp.data:
-                    for agent_record in agent_names_resp.data:
-                        agent_language_id = agent_record.get('language_id')
-                        agent_name = agent_record.get('agent_name')
-                        if agent_language_id and agent_name:
-                            # Get language code for the key
-                            lang_resp = self.supabase.table('language').select('language_code').eq('id', agent_language_id).limit(1).execute()
-                            if lang_resp.data:
-                                lang_code = lang_resp.data[0].get('language_code', 'en')
-                                dynamic_variables[f'agent_name_{lang_code}'] = agent_name
-
-
-
-            logger.info(f"Returning dynamic variables from Supabase: {list(dynamic_variables.keys())}")
-            logger.info(f"=== SUPABASE LOOKUP END (async) ===")
+            # Step 2: Client info, workflow configuration and agent names (cached per client)
+            dynamic_variables = get_client_dynamic_variables(client_id, client_ivr_language_configuration_id)
+
+            logger.info("Returning dynamic variables from Supabase: %s", list(dynamic_variables.keys()))
+            logger.info("=== SUPABASE LOOKUP END (async) ===")
             return dynamic_variables
             
         except Exception as e:
-            logger.error(f"Error getting customer data for {to_number}: {e}")
+            logger.error("Error getting customer data for %s: %s", to_number, e)
             return None
 
-    def _get_or_create_caller(self, from_number: str) -> Optional[str]:
+    def _submit_customer_data(self, to_number: str) -> Future:
         """
-        Get or create a caller record based on from_number
+        Start the Supabase customer data lookup on the shared lookup pool
         
         Args:
-            from_number: The caller's phone number
-            
+            to_number: The phone number to look up
+        
         Returns:
-            Caller ID (UUID) or None if failed
+            Future resolving to the customer data dictionary or None
         """
-        try:
-            logger.info(f"Looking up or creating caller for: {from_number}")
-            
-            # First, try to find existing caller
-            caller_resp = self.supabase.table('caller').select('id').eq('phone_number', from_number).limit(1).execute()
-            
-            if caller_resp.data:
-                # Caller exists
-                caller_id = caller_resp.data[0]['id']
-                logger.info(f"Found existing caller with ID: {caller_id}")
-                return caller_id
-            
-            # Caller doesn't exist, create new one
-            logger.info(f"Creating new caller record for: {from_number}")
-            new_caller_data = {
-                'phone_number': from_number,
-                'is_customer': 'unknown'  # We don't know yet
-            }
-            
-            create_resp = self.supabase.table('caller').insert(new_caller_data).execute()
-            if hasattr(create_resp, 'error') and create_resp.error:
-                logger.error(f"Error creating caller record: {create_resp.error}")
-                return None
-            
-            caller_id = create_resp.data[0]['id'] if create_resp.data else None
-            logger.info(f"Created new caller with ID: {caller_id}")
-            return caller_id
-            
-        except Exception as e:
-            logger.error(f"Error in _get_or_create_caller: {e}")
-            return None
+        # Run the async lookup on a pool thread so it never touches the caller's event loop
+        return _lookup_pool.submit(lambda: asyncio.run(self._get_customer_data_async(to_number)))
 
-    def _get_customer_data(self, to_number: str) -> Optional[Dict[str, Any]]:
+    def _get_customer_data(self, to_number: str, future: Optional[Future] = None) -> Optional[Dict[str, Any]]:
         """
         Get customer data based on to_number from Supabase
         
         Args:
             to_number: The phone number to look up
+            future: Lookup already started with _submit_customer_data (optional)
         
         Returns:
             Customer data dictionary or None if not found
         """
         # Supabase lookup
-        logger.info(f"Performing Supabase lookup for {to_number}")
+        logger.info("Performing Supabase lookup for %s", to_number)
         try:
-            # Use ThreadPoolExecutor to run async operations in sync context
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                data = executor.submit(lambda: asyncio.run(self._get_customer_data_async(to_number))).result()
-            
-            return data
+            if future is None:
+                future = self._submit_customer_data(to_number)
+            return future.result()
         except Exception as e:
-            logger.error(f"Error in _get_customer_data: {e}")
+            logger.error("Error in _get_customer_data: %s", e)
             return None
     
 
-    def _get_caller_language_from_phone_id(self, phone_number_id: str) -> Optional[str]:
+    def _get_twilio_call_data(self, call_sid: str) -> Dict[str, Any]:
         """
-        Get caller language based on phone_number_id from twilio_number table
+        Get call details for a Twilio call SID, from the cache or the Twilio API
         
         Args:
-            phone_number_id: The phone_number_id from the incoming payload
+            call_sid: The Twilio call SID to fetch details for
             
         Returns:
-            The language_code value or None if not found
+            twilio_call column values (None values removed)
         """
-        try:
-            logger.info(f"Looking up caller language for phone_number_id: {phone_number_id}")
-            # Find twilio_number row by vapi_phone_number_id
-            tn_resp = self.supabase.table('twilio_number').select('language_id').eq('vapi_phone_number_id', phone_number_id).limit(1).execute()
-            if not tn_resp.data:
-                logger.warning(f"No twilio_number found for phone_number_id: {phone_number_id}")
-                return None
-            language_id = tn_resp.data[0].get('language_id')
-            if not language_id:
-                logger.warning(f"No language_id set for phone_number_id: {phone_number_id}")
-                return None
-            lang_resp = self.supabase.table('language').select('language_code').eq('id', language_id).limit(1).execute()
-            if not lang_resp.data:
-                logger.warning(f"Language not found for id: {language_id}")
-                return None
-            language_code = lang_resp.data[0].get('language_code')
-            if language_code:
-                logger.info(f"Found caller language: {language_code} for phone_number_id: {phone_number_id}")
-                return language_code
-            logger.warning(f"No language_code found for language id: {language_id}")
-            return None
-                
-        except Exception as e:
-            logger.error(f"Error getting caller language for phone_number_id {phone_number_id}: {e}")
-            return None
+        twilio_call_data = _twilio_call_cache.get(call_sid)
+        if twilio_call_data is None:
+            twilio_call_data = self._fetch_twilio_call_data(call_sid)
+            _twilio_call_cache.set(call_sid, twilio_call_data)
+        else:
+            logger.info("Using cached Twilio call details for SID: %s", call_sid)
+        return twilio_call_data
 
     def _update_twilio_call_details(self, call_sid: str) -> None:
         """
@@ -485,44 +496,57 @@ class WebhookService:
             call_sid: The Twilio call SID to fetch details for
         """
         try:
-            logger.info(f"Fetching Twilio call details for SID: {call_sid}")
-            
-            # Fetch call details from Twilio
-            call = self.twilio.calls(call_sid).fetch()
-            
-            # Debug: Log available attributes
-            logger.info(f"Twilio call object attributes: {dir(call)}")
-            logger.info(f"Twilio call object: {call}")
-            
-            # Extract call details - use proper Twilio API attributes
-            twilio_call_data = {
-                'account_sid': getattr(call, 'account_sid', None),
-                'from_number': getattr(call, 'from_', None),
-                'to_number': getattr(call, 'to', None),
-                'start_time': call.start_time.isoformat() if hasattr(call, 'start_time') and call.start_time else None,
-                'end_time': call.end_time.isoformat() if hasattr(call, 'end_time') and call.end_time else None,
-                'duration': getattr(call, 'duration', None),
-                'direction': getattr(call, 'direction', None),
-                'answered_by': getattr(call, 'answered_by', None),
-                'forwarded_from': getattr(call, 'forwarded_from', None),
-                'price': getattr(call, 'price', None),
-                'call_type': getattr(call, 'call_type', None)
-            }
+            twilio_call_data = self._get_twilio_call_data(call_sid)
             
-            # Remove None values to avoid overwriting with null
-            twilio_call_data = {k: v for k, v in twilio_call_data.items() if v is not None}
-            
-            logger.info(f"Twilio call details - Duration: {twilio_call_data.get('duration')}s, Direction: {twilio_call_data.get('direction')}")
+            logger.info("Twilio call details - Duration: %ss, Direction: %s", twilio_call_data.get('duration'), twilio_call_data.get('direction'))
             
             # Update the twilio_call record
-            twilio_response = self.supabase.table('twilio_call').update(twilio_call_data).eq('call_sid', call_sid).execute()
+            twilio_response = self.supabase.table('twilio_call').update(twilio_call_data, returning=ReturnMethod.minimal).eq('call_sid', call_sid).execute()
             if hasattr(twilio_response, 'error') and twilio_response.error:
-                logger.error(f"Error updating twilio_call record: {twilio_response.error}")
+                logger.error("Error updating twilio_call record: %s", twilio_response.error)
             else:
-                logger.info(f"Successfully updated twilio_call record with Twilio details")
+                logger.info("Successfully updated twilio_call record with Twilio details")
                 
         except Exception as e:
-            logger.error(f"Error fetching/updating Twilio call details: {e}")
+            logger.error("Error fetching/updating Twilio call details: %s", e)
+
+    def _fetch_twilio_call_data(self, call_sid: str) -> Dict[str, Any]:
+        """
+        Fetch call details from the Twilio API
+        
+        Args:
+            call_sid: The Twilio call SID to fetch details for
+            
+        Returns:
+            twilio_call column values (None values removed)
+        """
+        logger.info("Fetching Twilio call details for SID: %s", call_sid)
+        
+        # Fetch call details from Twilio
+        call = self.twilio.calls(call_sid).fetch()
+        
+        # Debug: Log available attributes
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Twilio call object attributes: %s", dir(call))
+            logger.debug("Twilio call object: %s", call)
+        
+        # Extract call details - use proper Twilio API attributes
+        twilio_call_data = {
+            'account_sid': getattr(call, 'account_sid', None),
+            'from_number': getattr(call, 'from_', None),
+            'to_number': getattr(call, 'to', None),
+            'start_time': call.start_time.isoformat() if hasattr(call, 'start_time') and call.start_time else None,
+            'end_time': call.end_time.isoformat() if hasattr(call, 'end_time') and call.end_time else None,
+            'duration': getattr(call, 'duration', None),
+            'direction': getattr(call, 'direction', None),
+            'answered_by': getattr(call, 'answered_by', None),
+            'forwarded_from': getattr(call, 'forwarded_from', None),
+            'price': getattr(call, 'price', None),
+            'call_type': getattr(call, 'call_type', None)
+        }
+        
+        # Remove None values to avoid overwriting with null
+        return {k: v for k, v in twilio_call_data.items() if v is not None}
 
     def _generate_node_transcript(self, transcript_with_tool_calls: str) -> str:
         """
@@ -541,7 +565,7 @@ class WebhookService:
             
             # transcript_with_tool_calls is already a Python object, not JSON string
             steps = transcript_with_tool_calls
-            logger.info(f"Processing transcript_with_tool_calls with {len(steps)} steps")
+            logger.info("Processing transcript_with_tool_calls with %s steps", len(steps))
             
             # Initialize tracking variables
             current_node = "begin"
@@ -551,7 +575,8 @@ class WebhookService:
             node_transcript_parts = []
             
             for step in steps:
-                step_type = step.get('type', '')
+                get = step.get
+                step_type = get('type', '')
                 
                 # Handle node transitions
                 if step_type == "node_transition":
@@ -561,42 +586,30 @@ class WebhookService:
                         node_transcript_parts.append(node_summary)
                     
                     # Start new node
-                    current_node = step.get('new_node_name', 'unknown')
+                    current_node = get('new_node_name', 'unknown')
                     node_start = None
                     node_end = None
                     buffer = []
                 
-                # Handle agent speech
-                elif step_type == "agent" and step.get('words'):
-                    words = step.get('words', [])
-                    if words:
-                        first = words[0]
-                        last = words[-1]
-                        node_start = node_start or first.get('start', 0)
-                        node_end = last.get('end', 0)
-                        buffer.append(f'Agent: "{step.get("content", "")}"')
-                
-                # Handle user speech
-                elif step_type == "user" and step.get('words'):
-                    words = step.get('words', [])
+                # Handle agent and user speech
+                elif step_type in _SPEAKER_LABELS:
+                    words = get('words')
                     if words:
-                        first = words[0]
-                        last = words[-1]
-                        node_start = node_start or first.get('start', 0)
-                        node_end = last.get('end', 0)
-                        buffer.append(f'User: "{step.get("content", "")}"')
+                        node_start = node_start or words[0].get('start', 0)
+                        node_end = words[-1].get('end', 0)
+                        buffer.append(f'{_SPEAKER_LABELS[step_type]}: "{get("content", "")}"')
                 
                 # Handle DTMF (touch-tone)
                 elif step_type == "dtmf":
-                    buffer.append(f'User: Pressed DTMF "{step.get("digit", "")}"')
+                    buffer.append(f'User: Pressed DTMF "{get("digit", "")}"')
                 
                 # Handle tool calls
                 elif step_type == "tool_call_invocation":
-                    tool_name = step.get('tool_name', '')
+                    tool_name = get('tool_name', '')
                     if tool_name == "extract_dynamic_variables":
                         buffer.append("System: Detected language as Dutch")
                     elif tool_name == "agent_swap":
-                        agent_id = step.get('agent_id', 'unknown')
+                        agent_id = get('agent_id', 'unknown')
                         buffer.append(f"System: Swapped to Dutch agent ({agent_id})")
                     else:
                         buffer.append(f"System: Executed tool {tool_name}")
@@ -608,13 +621,32 @@ class WebhookService:
             
             # Join all node parts
             node_transcript = "\n\n".join(node_transcript_parts)
-            logger.info(f"Generated node transcript with {len(node_transcript_parts)} nodes")
+            logger.info("Generated node transcript with %s nodes", len(node_transcript_parts))
             return node_transcript
             
         except Exception as e:
-            logger.error(f"Error generating node transcript: {e}")
+            logger.error("Error generating node transcript: %s", e)
             return ""
 
+    def _update_retell_event_by_call_id(self, call_id: str, update_data: Dict[str, Any], skip_status: str):
+        """
+        Update the retell_event record for a call in a single request
+        
+        Args:
+            call_id: Retell call ID
+            update_data: Columns to update
+            skip_status: call_status that means this event was already applied
+        
+        Returns:
+            PostgREST response; count holds the number of updated rows
+        """
+        # Only the affected-row count is needed, so skip echoing the (large) transcript back
+        # Setting the same columns twice is harmless, so network blips are retried
+        # Rows already in skip_status are filtered out so duplicate deliveries don't rewrite them
+        return retry_db(self.supabase.table('retell_event').update(
+            update_data, count=CountMethod.exact, returning=ReturnMethod.minimal
+        ).eq('call_id', call_id).or_(f'call_status.is.null,call_status.neq.{skip_status}').execute)
+
     def _handle_call_ended_event(self, data: Dict[str, Any]) -> None:
         """
         Handle call_ended events by updating existing retell_event record
@@ -623,62 +655,42 @@ class WebhookService:
             data: The webhook payload from Retell AI
         """
         try:
-            call_data = data.get('call', {})
+            call_data = data.get('call') or _EMPTY
             
             # Extract data from call_ended payload
             call_id = call_data.get('call_id', '')
-            call_status = call_data.get('call_status', '')
-            end_timestamp = call_data.get('end_timestamp', '')
-            disconnection_reason = call_data.get('disconnection_reason', '')
-            transcript = call_data.get('transcript', '')
-            transcript_object = call_data.get('transcript_object', '')
-            transcript_with_tool_calls = call_data.get('transcript_with_tool_calls', '')
-            node_transcript = call_data.get('node_transcript', '')
-            recording_url = call_data.get('recording_url', '')
-            opt_out_sensitive_data_storage = call_data.get('opt_out_sensitive_data_storage', False)
-            
-            logger.info(f"Updating retell_event record for call_ended event - Call ID: {call_id}")
-            
-            # Find existing retell_event record by call_id
-            retell_resp = self.supabase.table('retell_event').select('id').eq('call_id', call_id).limit(1).execute()
-            if not retell_resp.data:
-                logger.error(f"No retell_event record found for call_id: {call_id}")
+            update_data = _extract_fields(call_data, _CALL_ENDED_FIELDS)
+            transcript_with_tool_calls = update_data.get('transcript_with_tool_calls', '')
+            
+            if not call_id:
+                logger.error("No call_id in call_ended payload")
                 return
             
-            retell_event_id = retell_resp.data[0]['id']
-            logger.info(f"Found existing retell_event record with ID: {retell_event_id}")
+            logger.info("Updating retell_event record for call_ended event - Call ID: %s", call_id)
             
             # Generate node transcript from transcript_with_tool_calls
-            logger.info(f"Generating node transcript - transcript_with_tool_calls length: {len(transcript_with_tool_calls) if transcript_with_tool_calls else 0}")
-            logger.info(f"transcript_with_tool_calls preview: {transcript_with_tool_calls[:200] if transcript_with_tool_calls else 'None'}")
+            logger.info("Generating node transcript - transcript_with_tool_calls length: %s", len(transcript_with_tool_calls) if transcript_with_tool_calls else 0)
+            logger.info("transcript_with_tool_calls preview: %s", transcript_with_tool_calls[:200] if transcript_with_tool_calls else 'None')
             generated_node_transcript = self._generate_node_transcript(transcript_with_tool_calls)
-            logger.info(f"Generated node transcript length: {len(generated_node_transcript) if generated_node_transcript else 0}")
-            logger.info(f"Generated node transcript preview: {generated_node_transcript[:200] if generated_node_transcript else 'None'}")
+            logger.info("Generated node transcript length: %s", len(generated_node_transcript) if generated_node_transcript else 0)
+            logger.info("Generated node transcript preview: %s", generated_node_transcript[:200] if generated_node_transcript else 'None')
             
             # Update retell_event record with call_ended data
-            update_data = {
-                'call_status': call_status,
-                'end_timestamp': end_timestamp,
-                'disconnection_reason': disconnection_reason,
-                'transcript': transcript,
-                'transcript_object': transcript_object,
-                'transcript_with_tool_calls': transcript_with_tool_calls,
-                'node_transcript': generated_node_transcript,
-                'recording_url': recording_url,
-                'opt_out_sensitive_data_storage': opt_out_sensitive_data_storage
-            }
-            
-            # Remove None values to avoid overwriting with null
-            update_data = {k: v for k, v in update_data.items() if v is not None}
+            if generated_node_transcript is not None:
+                update_data['node_transcript'] = generated_node_transcript
             
-            retell_response = self.supabase.table('retell_event').update(update_data).eq('id', retell_event_id).execute()
+            # Update the retell_event record by call_id directly (no SELECT round trip)
+            retell_response = self._update_retell_event_by_call_id(call_id, update_data, 'ended')
             if hasattr(retell_response, 'error') and retell_response.error:
-                logger.error(f"Error updating retell_event record: {retell_response.error}")
+                logger.error("Error updating retell_event record: %s", retell_response.error)
+            elif not retell_response.count:
+                logger.error("No retell_event record to update for call_id: %s (missing or already ended)", call_id)
             else:
-                logger.info(f"Successfully updated retell_event record for call_ended event")
+                logger.info("Successfully updated retell_event record for call_ended event")
                 
         except Exception as e:
-            logger.error(f"Error handling call_ended event: {e}")
+            logger.error("Error handling call_ended event: %s", e)
+            raise
 
     def _handle_call_analyzed_event(self, data: Dict[str, Any]) -> None:
         """
@@ -689,62 +701,52 @@ class WebhookService:
             data: The webhook payload from Retell AI
         """
         try:
-            call_data = data.get('call', {})
+            call_data = data.get('call') or _EMPTY
             
             # Extract call_id from call_analyzed payload
             call_id = call_data.get('call_id', '')
             
             # Extract call_analysis data
-            call_analysis = call_data.get('call_analysis', {})
-            call_summary = call_analysis.get('call_summary', '')
-            in_voicemail = call_analysis.get('in_voicemail', False)
-            user_sentiment = call_analysis.get('user_sentiment', '')
-            call_successful = call_analysis.get('call_successful', False)
-            custom_analysis_data = call_analysis.get('custom_analysis_data', {})
-            
-            logger.info(f"Updating retell_event record for call_analyzed event - Call ID: {call_id}")
-            logger.info(f"Call analysis - Summary: {call_summary[:100]}..., Voicemail: {in_voicemail}, Sentiment: {user_sentiment}, Successful: {call_successful}")
-            
-            # Find existing retell_event record by call_id
-            retell_resp = self.supabase.table('retell_event').select('id').eq('call_id', call_id).limit(1).execute()
-            if not retell_resp.data:
-                logger.error(f"No retell_event record found for call_id: {call_id}")
+            call_analysis = call_data.get('call_analysis') or _EMPTY
+            analysis_data = _extract_fields(call_analysis, _CALL_ANALYSIS_FIELDS)
+            call_summary = analysis_data.get('call_summary', '')
+            
+            if not call_id:
+                logger.error("No call_id in call_analyzed payload")
                 return
             
-            retell_event_id = retell_resp.data[0]['id']
-            logger.info(f"Found existing retell_event record with ID: {retell_event_id}")
+            logger.info("Updating retell_event record for call_analyzed event - Call ID: %s", call_id)
+            logger.info("Call analysis - Summary: %s..., Voicemail: %s, Sentiment: %s, Successful: %s", call_summary[:100], analysis_data.get('in_voicemail'), analysis_data.get('user_sentiment'), analysis_data.get('call_successful'))
             
             # Update retell_event record with call_analysis data
             update_data = {
                 'call_status': 'analyzed',  # Update call status to analyzed
-                'call_summary': call_summary,
-                'in_voicemail': in_voicemail,
-                'user_sentiment': user_sentiment,
-                'call_successful': call_successful,
-                'custom_analysis_data': custom_analysis_data
+                **analysis_data
             }
             
-            # Remove None values to avoid overwriting with null
-            update_data = {k: v for k, v in update_data.items() if v is not None}
-            
-            retell_response = self.supabase.table('retell_event').update(update_data).eq('id', retell_event_id).execute()
+            retell_response = self._update_retell_event_by_call_id(call_id, update_data, 'analyzed')
             if hasattr(retell_response, 'error') and retell_response.error:
-                logger.error(f"Error updating retell_event record: {retell_response.error}")
+                logger.error("Error updating retell_event record: %s", retell_response.error)
+            elif not retell_response.count:
+                logger.error("No retell_event record to update for call_id: %s (missing or already analyzed)", call_id)
+                return
             else:
-                logger.info(f"Successfully updated retell_event record for call_analyzed event with call analysis data")
+                logger.info("Successfully updated retell_event record for call_analyzed event with call analysis data")
             
-            # Now fetch and update Twilio call details
-            telephony_identifier = call_data.get('telephony_identifier', {})
+            # Now fetch and update Twilio call details (only once the update matched a row, so
+            # duplicate or out-of-order deliveries never reach the paid Twilio API)
+            telephony_identifier = call_data.get('telephony_identifier') or _EMPTY
             twilio_call_sid = telephony_identifier.get('twilio_call_sid', '')
             
             if twilio_call_sid:
-                logger.info(f"Fetching Twilio call details for SID: {twilio_call_sid}")
+                logger.info("Fetching Twilio call details for SID: %s", twilio_call_sid)
                 self._update_twilio_call_details(twilio_call_sid)
             else:
                 logger.warning("No Twilio call SID found, skipping Twilio call details update")
                 
         except Exception as e:
-            logger.error(f"Error handling call_analyzed event: {e}")
+            logger.error("Error handling call_analyzed event: %s", e)
+            raise
 
     def _handle_call_started_event(self, data: Dict[str, Any]) -> None:
         """
@@ -754,24 +756,22 @@ class WebhookService:
             data: The webhook payload from Retell AI
         """
         try:
-            call_data = data.get('call', {})
+            call_data = data.get('call') or _EMPTY
             
-            # Extract data from call_started payload
-            call_id = call_data.get('call_id', '')
-            call_type = call_data.get('call_type', '')
-            agent_id = call_data.get('agent_id', '')
-            agent_name = call_data.get('agent_name', '')
-            call_status = call_data.get('call_status', '')
+            # Build the retell_event update straight from the payload; only these columns are
+            # read, so the rest of the call object (transcript etc.) is never touched
+            retell_event_update_data = {key: call_data.get(key, default) for key, default in _CALL_STARTED_FIELDS}
+            call_id = retell_event_update_data['call_id']
+            direction = retell_event_update_data['direction']
             from_number = call_data.get('from_number', '')
             to_number = call_data.get('to_number', '')
-            direction = call_data.get('direction', '')
             
             # Extract Twilio call SID from telephony_identifier
-            telephony_identifier = call_data.get('telephony_identifier', {})
-            twilio_call_sid = telephony_identifier.get('twilio_call_sid', '')
+            twilio_call_sid = (call_data.get('telephony_identifier') or _EMPTY).get('twilio_call_sid', '')
             
             # Extract dynamic variables if present
-            retell_llm_dynamic_variables = call_data.get('retell_llm_dynamic_variables', {})
+            retell_llm_dynamic_variables = call_data.get('retell_llm_dynamic_variables') or {}
+            retell_event_update_data['retell_llm_dynamic_variables'] = retell_llm_dynamic_variables
             
             # Get retell_event_id, caller_id, original_call_sid, and original_twilio_call_id from dynamic variables
             retell_event_id = retell_llm_dynamic_variables.get('retell_event_id')
@@ -779,28 +779,19 @@ class WebhookService:
             original_call_sid = retell_llm_dynamic_variables.get('original_call_sid')  # Media Stream CallSid
             original_twilio_call_id = retell_llm_dynamic_variables.get('original_twilio_call_id')  # ID of original record
             
-            logger.info(f"Updating retell_event for call_started event - Call ID: {call_id}, Retell Event ID: {retell_event_id}, Twilio SID: {twilio_call_sid}, Original CallSid: {original_call_sid}")
+            logger.info("Updating retell_event for call_started event - Call ID: %s, Retell Event ID: %s, Twilio SID: %s, Original CallSid: %s", call_id, retell_event_id, twilio_call_sid, original_call_sid)
             
             if not retell_event_id:
                 logger.error("No retell_event_id found in dynamic variables")
                 return
             
             # 1. Update existing retell_event record
-            retell_event_update_data = {
-                'call_id': call_id,
-                'call_type': call_type,
-                'agent_id': agent_id,
-                'call_status': call_status,
-                'direction': direction,
-                'retell_llm_dynamic_variables': retell_llm_dynamic_variables
-            }
-            
-            retell_response = self.supabase.table('retell_event').update(retell_event_update_data).eq('id', retell_event_id).execute()
+            retell_response = self.supabase.table('retell_event').update(retell_event_update_data, returning=ReturnMethod.minimal).eq('id', retell_event_id).execute()
             if hasattr(retell_response, 'error') and retell_response.error:
-                logger.error(f"Error updating retell_event record: {retell_response.error}")
+                logger.error("Error updating retell_event record: %s", retell_response.error)
                 return
             
-            logger.info(f"Updated retell_event record with ID: {retell_event_id}")
+            logger.info("Updated retell_event record with ID: %s", retell_event_id)
             
             # 2. Create Retell bridge twilio_call record (SIP CallSid) and link to original record
             if twilio_call_sid and caller_id and original_twilio_call_id:
@@ -817,10 +808,10 @@ class WebhookService:
                 
                 retell_bridge_response = self.supabase.table('twilio_call').insert(retell_bridge_twilio_call_data).execute()
                 if hasattr(retell_bridge_response, 'error') and retell_bridge_response.error:
-                    logger.error(f"Error creating Retell bridge twilio_call record: {retell_bridge_response.error}")
+                    logger.error("Error creating Retell bridge twilio_call record: %s", retell_bridge_response.error)
                 else:
                     retell_bridge_id = retell_bridge_response.data[0]['id'] if retell_bridge_response.data else None
-                    logger.info(f"Created Retell bridge twilio_call record with ID: {retell_bridge_id} for SIP CallSid: {twilio_call_sid}, linked to original record: {original_twilio_call_id}")
+                    logger.info("Created Retell bridge twilio_call record with ID: %s for SIP CallSid: %s, linked to original record: %s", retell_bridge_id, twilio_call_sid, original_twilio_call_id)
             else:
                 if not twilio_call_sid:
                     logger.warning("No twilio_call_sid found in telephony_identifier, skipping Retell bridge record creation")
@@ -830,7 +821,24 @@ class WebhookService:
                     logger.warning("No original_twilio_call_id found in dynamic variables, skipping Retell bridge record creation")
                 
         except Exception as e:
-            logger.error(f"Error handling call_started event: {e}")
+            logger.error("Error handling call_started event: %s", e)
+            raise
+
+    def _run_event_handler(self, handler, data: Dict[str, Any], seen_key: Optional[tuple]) -> None:
+        """
+        Run a lifecycle event handler on the background worker
+        
+        Args:
+            handler: One of the _event_handlers methods (logs its own errors, then re-raises)
+            data: The webhook payload from Retell AI
+            seen_key: The event's _seen_events key, or None if it has no call_id
+        """
+        try:
+            handler(data)
+        except Exception:
+            # Forget the event so a Retell retry of it is processed instead of dropped as a duplicate
+            if seen_key is not None:
+                _seen_events.pop(seen_key)
 
     def process_inbound_webhook(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -845,34 +853,43 @@ class WebhookService:
         try:
             event_type = data.get('event', '')
             
-                        # Handle call_started events - create database records
-            if event_type == 'call_started':
-                self._handle_call_started_event(data)
-            
-            # Handle call_ended events - update existing retell_event record
-            if event_type == 'call_ended':
-                self._handle_call_ended_event(data)
-            
-            # Handle call_analyzed events - update existing retell_event record
-            if event_type == 'call_analyzed':
-                self._handle_call_analyzed_event(data)
+            # Lifecycle events only need an acknowledgement, so Retell gets its 200
+            # right away and the Supabase/Twilio work runs on the background worker
+            handler = self._event_handlers.get(event_type)
+            if handler is not None:
+                call_id = (data.get('call') or _EMPTY).get('call_id')
+                seen_key = (event_type, call_id) if call_id else None
+                if seen_key and not _seen_events.add(seen_key, True):
+                    logger.info("Duplicate %s event for call %s, already processed", event_type, call_id)
+                    return {'status': 'success', 'event': event_type, 'duplicate': True}
+                _event_pool.submit(self._run_event_handler, handler, data, seen_key)
+                logger.info("Queued %s event for background processing", event_type)
+                return {'status': 'success', 'event': event_type}
             
             # Only process inbound webhook response for call_inbound events
             if event_type == 'call_inbound':
                 # Extract data from call_inbound webhook
-                inbound_data = data.get('call_inbound', {})
+                inbound_data = data.get('call_inbound') or _EMPTY
                 from_number = inbound_data.get('from_number', '')
                 to_number = inbound_data.get('to_number', '')
                 agent_id = inbound_data.get('agent_id', '')
                 phone_number_id = inbound_data.get('phone_number_id', '')
                 
-                logger.info(f"Processing inbound webhook - From: {from_number}, To: {to_number}, Agent: {agent_id}")
+                logger.info("Processing inbound webhook - From: %s, To: %s, Agent: %s", from_number, to_number, agent_id)
                 
-                # 1. Get or create caller record
-                caller_id = self._get_or_create_caller(from_number)
-                if not caller_id:
-                    logger.error(f"Failed to get or create caller for: {from_number}")
-                    return {'error': 'Failed to process caller'}, 500
+                # Customer data only depends on to_number, so look it up while the caller/event records are written
+                customer_future = self._submit_customer_data(to_number)
+                
+                # 1. Get or create caller record (skipped for withheld caller ID,
+                #    which would otherwise all share one blank-number caller row)
+                if from_number:
+                    caller_id = get_or_create_caller(from_number)
+                    if not caller_id:
+                        logger.error("Failed to get or create caller for: %s", from_number)
+                        return {'error': 'Failed to process caller'}, 500
+                else:
+                    caller_id = None
+                    logger.info("No from_number on inbound call, skipping caller lookup")
                 
                 # 2. Create initial retell_event record
                 retell_event_data = {
@@ -885,29 +902,23 @@ class WebhookService:
                 
                 retell_response = self.supabase.table('retell_event').insert(retell_event_data).execute()
                 if hasattr(retell_response, 'error') and retell_response.error:
-                    logger.error(f"Error creating retell_event record: {retell_response.error}")
+                    logger.error("Error creating retell_event record: %s", retell_response.error)
                     return {'error': 'Failed to create call record'}, 500
                 
                 retell_event_id = retell_response.data[0]['id'] if retell_response.data else None
-                logger.info(f"Created retell_event record with ID: {retell_event_id}")
+                logger.info("Created retell_event record with ID: %s", retell_event_id)
                 
-                # 3. Get customer data based on to_number
-                customer_data = self._get_customer_data(to_number)
+                # 3. Get customer data based on to_number (started above)
+                customer_data = self._get_customer_data(to_number, customer_future)
                 
                 # 4. Build dynamic variables
-                dynamic_variables = {}
                 if customer_data:
-                    # Use customer data from Supabase
-                    dynamic_variables.update(customer_data)
-                    logger.info(f"Using customer data for known customer: {list(customer_data.keys())}")
+                    # Use customer data from Supabase (built fresh per lookup, so extend it in place)
+                    dynamic_variables = customer_data
+                    logger.info("Using customer data for known customer: %s", list(customer_data.keys()))
                 else:
                     # Default variables for unknown customers
-                    dynamic_variables = {
-                        'customer_name': 'Valued Customer',
-                        'customer_id': 'unknown',
-                        'account_type': 'standard',
-                        'client_name': 'Our Company'
-                    }
+                    dynamic_variables = dict(DEFAULT_DYNAMIC_VARIABLES)
                     logger.info("Using default variables for unknown customer")
                 
                 # 5. Add retell_event_id and caller_id to dynamic variables
@@ -916,7 +927,7 @@ class WebhookService:
                 
                 # 6. Build metadata
                 metadata = {
-                    'inbound_timestamp': datetime.now().isoformat(),
+                    'inbound_timestamp': utc_timestamp(),
                     'phone_number_id': phone_number_id
                 }
                 
@@ -931,28 +942,23 @@ class WebhookService:
                 # 8. Add agent override if customer has a preferred agent
                 if customer_data and 'preferred_agent_id' in customer_data:
                     response['call_inbound']['override_agent_id'] = customer_data['preferred_agent_id']
-                    logger.info(f"Overriding agent to: {customer_data['preferred_agent_id']}")
+                    logger.info("Overriding agent to: %s", customer_data['preferred_agent_id'])
                 
-                logger.info(f"Inbound webhook processed successfully. Retell Event ID: {retell_event_id}, Caller ID: {caller_id}")
+                logger.info("Inbound webhook processed successfully. Retell Event ID: %s, Caller ID: %s", retell_event_id, caller_id)
                 return response
             else:
-                # For other events (call_started, call_ended, call_analyzed), just return success
-                logger.info(f"Processed {event_type} event successfully")
+                # Any other event type is acknowledged without processing
+                logger.info("Ignoring unhandled event type: %s", event_type)
                 return {'status': 'success', 'event': event_type}
             
         except Exception as e:
-            logger.error(f"Error processing inbound webhook: {e}")
+            logger.error("Error processing inbound webhook: %s", e)
             # Return a safe default response
             return {
                 'call_inbound': {
-                    'dynamic_variables': {
-                        'customer_name': 'Valued Customer',
-                        'customer_id': 'unknown',
-                        'account_type': 'standard',
-                        'client_name': 'Our Company'
-                    },
+                    'dynamic_variables': dict(DEFAULT_DYNAMIC_VARIABLES),
                     'metadata': {
-                        'inbound_timestamp': datetime.now().isoformat(),
+                        'inbound_timestamp': utc_timestamp(),
                         'caller_known': False,
                         'error': str(e)
                     }
@@ -7,6 +7,7 @@ import os
 from typing import Optional
 import openai
 from config import Config
+from utils.http_client import download_session, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -81,17 +82,20 @@ class WhisperService:
             
             # Download the audio file
             logger.info("Downloading audio file for transcription")
-            response = requests.get(audio_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Log file size for debugging
-            file_size = len(response.content)
-            logger.info(f"Downloaded audio file size: {file_size} bytes ({file_size / 1024:.1f} KB)")
-            
             # Use context manager for automatic cleanup
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=True) as temp_file:
-                temp_file.write(response.content)
+            with download_session.get(audio_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response, \
+                    tempfile.NamedTemporaryFile(suffix='.wav', delete=True) as temp_file:
+                response.raise_for_status()
+                
+                # Stream to disk instead of buffering the whole body in memory
+                file_size = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    temp_file.write(chunk)
+                    file_size += len(chunk)
                 temp_file.flush()  # Ensure all data is written
+                
+                # Log file size for debugging
+                logger.info(f"Downloaded audio file size: {file_size} bytes ({file_size / 1024:.1f} KB)")
                 temp_file.seek(0)  # Reset file pointer to beginning
                 
                 # Transcribe using OpenAI Whisper
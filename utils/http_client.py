@@ -0,0 +1,16 @@
+"""
+Shared HTTP session for recording downloads in the Siftly application
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+# Chunk size used when streaming remote audio to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Seconds to wait for the recording host to connect or send data
+DOWNLOAD_TIMEOUT = 30
+
+# Keep-alive session so repeated recording downloads reuse the TLS connection
+# (one pool for every transcription service in the process)
+download_session = requests.Session()
+download_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
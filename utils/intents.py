@@ -3,11 +3,13 @@
 Intent utility functions for per-client slug resolution
 """
 
-from functools import lru_cache
 from typing import Optional
 from supabase import Client
+from utils.cache import TTLCache
+
+# Intent ids by (client_id, slug); failed lookups are not cached so they are retried
+_intent_id_cache = TTLCache(ttl_seconds=600, maxsize=2048)
 
-@lru_cache(maxsize=2048)
 def get_intent_id_by_slug(sb: Client, client_id: str, slug: str) -> Optional[str]:
     """
     Get intent ID by client and slug with caching.
@@ -20,6 +22,16 @@ def get_intent_id_by_slug(sb: Client, client_id: str, slug: str) -> Optional[str
     Returns:
         Intent UUID or None if not found
     """
+    key = (client_id, slug)
+    intent_id = _intent_id_cache.get(key)
+    if intent_id is None:
+        intent_id = _lookup_intent_id_by_slug(sb, client_id, slug)
+        if intent_id is not None:
+            _intent_id_cache.set(key, intent_id)
+    return intent_id
+
+def _lookup_intent_id_by_slug(sb: Client, client_id: str, slug: str) -> Optional[str]:
+    """Query the intent ID by client and slug, auto-provisioning general_question if missing"""
     try:
         r = sb.table("intent").select("id").eq("client_id", client_id).eq("slug", slug).single().execute()
         if hasattr(r, "error") and r.error:
@@ -1,10 +1,64 @@
 """
 Logging utility for the Siftly application
 """
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 from config import Config
 
+# Log records are queued by the calling thread and written to stdout by a
+# background listener, so request handlers never block on log I/O
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+def _start_listener() -> None:
+    """Start (or restart) the background thread that writes queued records to stdout"""
+    global _listener
+    if _queue_handler is None:
+        return
+    # Use a fresh queue: after a fork the parent's queue and listener thread are unusable
+    _queue_handler.queue = queue.SimpleQueue()
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter(Config.LOG_FORMAT))
+    _listener = QueueListener(_queue_handler.queue, console_handler, respect_handler_level=True)
+    _listener.start()
+
+def _stop_listener() -> None:
+    """Flush any queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def _configure_root_logger(root_logger: logging.Logger) -> None:
+    """
+    Route the root logger through the queue handler
+    
+    Args:
+        root_logger: The root logger (expected to have no handlers)
+    """
+    global _queue_handler
+    root_logger.setLevel(logging.INFO)
+    
+    _stop_listener()
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    _start_listener()
+    root_logger.addHandler(_queue_handler)
+    
+    # Reduce verbosity of external libraries
+    logging.getLogger('twilio.http_client').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
+
+# gunicorn preloads the app, and threads don't survive fork: restart the listener in each worker
+os.register_at_fork(after_in_child=_start_listener)
+atexit.register(_stop_listener)
+
 def setup_logger(name: str, level: str = None) -> logging.Logger:
     """
     Set up a logger with consistent formatting
@@ -18,27 +72,12 @@ def setup_logger(name: str, level: str = None) -> logging.Logger:
     """
     # Configure root logger to ensure all loggers work
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
     
     # Remove existing handlers to avoid duplicates
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
-    # Create console handler for root logger
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    
-    # Reduce verbosity of external libraries
-    logging.getLogger('twilio.http_client').setLevel(logging.WARNING)
-    logging.getLogger('httpx').setLevel(logging.WARNING)
-    logging.getLogger('urllib3').setLevel(logging.WARNING)
-    
-    # Create formatter
-    formatter = logging.Formatter(Config.LOG_FORMAT)
-    console_handler.setFormatter(formatter)
-    
-    # Add handler to root logger
-    root_logger.addHandler(console_handler)
+    _configure_root_logger(root_logger)
     
     # Get the specific logger
     logger = logging.getLogger(name)
@@ -60,16 +99,6 @@ def get_logger(name: str) -> logging.Logger:
     root_logger = logging.getLogger()
     if not root_logger.handlers:
         # Configure root logger if not already done
-        root_logger.setLevel(logging.INFO)
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        formatter = logging.Formatter(Config.LOG_FORMAT)
-        console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
-        
-        # Reduce verbosity of external libraries
-        logging.getLogger('twilio.http_client').setLevel(logging.WARNING)
-        logging.getLogger('httpx').setLevel(logging.WARNING)
-        logging.getLogger('urllib3').setLevel(logging.WARNING)
+        _configure_root_logger(root_logger)
     
     return logging.getLogger(name) 
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+Retry helpers for the Siftly application
+"""
+import random
+import time
+from typing import Callable, Tuple, Type, TypeVar
+import httpx
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+# Network-level failures from the Supabase (httpx) client; the request never
+# produced a response, so repeating a read or an idempotent write is safe
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (httpx.TransportError,)
+
+def retry_db(fn: Callable[[], T], *, max_retries: int = 3, base: float = 0.2,
+             cap: float = 2.0, jitter: float = 0.5) -> T:
+    """
+    Call fn, retrying transient network errors with jittered exponential backoff
+
+    Only wrap reads and idempotent writes: a timed-out insert may still have
+    been applied. The delays are kept short because most callers sit on a
+    Retell or Twilio webhook deadline.
+
+    Args:
+        fn: Zero-argument callable, e.g. lambda: query.execute()
+        max_retries: Retries after the first attempt
+        base: Base delay in seconds
+        cap: Maximum delay in seconds
+        jitter: Random extra fraction of the delay (0 disables jitter)
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        The last transient error once retries are exhausted, or any other error immediately
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except TRANSIENT_ERRORS as e:
+            if attempt >= max_retries:
+                raise
+            delay = min(cap, base * 2 ** attempt) * (1 + random.uniform(0, jitter))
+            attempt += 1
+            logger.warning("Transient Supabase error (%s), retry %d/%d in %.2fs", e, attempt, max_retries, delay)
+            time.sleep(delay)
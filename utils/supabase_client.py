@@ -0,0 +1,37 @@
+"""
+Shared Supabase client for the Siftly application
+"""
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from supabase import create_client, Client
+from config import Config
+from utils.retry import retry_db
+
+@lru_cache(maxsize=1)
+def get_supabase_client() -> Client:
+    """
+    Get the process-wide Supabase client (created on first use)
+
+    Reusing one client keeps its HTTP connection pool and auth headers
+    across requests instead of rebuilding them for every webhook.
+
+    Returns:
+        Supabase client using the service role key
+    """
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_ROLE_KEY)
+
+def fetch_one(query) -> Optional[Dict[str, Any]]:
+    """
+    Execute a single-row lookup and return the row itself
+
+    Uses maybe_single() so PostgREST answers with one object instead of a
+    list; limit(1) keeps duplicate rows from turning into an error.
+
+    Args:
+        query: Filtered Supabase select builder
+
+    Returns:
+        The matching row or None
+    """
+    resp = retry_db(query.limit(1).maybe_single().execute)
+    return resp.data if resp is not None else None
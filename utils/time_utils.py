@@ -0,0 +1,22 @@
+"""
+Time helpers for the Siftly application
+"""
+from datetime import datetime, timezone
+
+def utc_now() -> datetime:
+    """
+    Get the current time as a timezone-aware UTC datetime
+
+    Returns:
+        Current UTC datetime (replaces the deprecated datetime.utcnow())
+    """
+    return datetime.now(timezone.utc)
+
+def utc_timestamp() -> str:
+    """
+    Get the current UTC time as an ISO 8601 string with a Z suffix
+
+    Returns:
+        Timestamp such as '2024-01-01T12:00:00.000Z'
+    """
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
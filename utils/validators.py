@@ -1,9 +1,74 @@
 """
 Validation utilities for the Siftly application
 """
-from typing import Dict, Any
+import base64
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import Dict, Any, List
 import re
 
+# Retell call lifecycle events that carry their data under 'call'
+RETELL_LIFECYCLE_EVENTS = frozenset({'call_started', 'call_ended', 'call_analyzed'})
+
+# All Retell events accepted by the inbound webhook
+RETELL_EVENTS = RETELL_LIFECYCLE_EVENTS | {'call_inbound'}
+
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+
+# Formatting characters stripped from phone numbers before lookups
+_PHONE_FORMATTING = str.maketrans('', '', ' -()')
+
+@lru_cache(maxsize=10000)
+def normalize_phone_number(phone_number: str) -> str:
+    """
+    Strip formatting characters so phone numbers compare and cache consistently
+    
+    Args:
+        phone_number: Phone number as received (e.g. "+1 (555) 123-4567")
+        
+    Returns:
+        The number without spaces, dashes or parentheses (e.g. "+15551234567")
+    """
+    return phone_number.translate(_PHONE_FORMATTING)
+
+def compute_twilio_signature(signing_key: bytes, url: str, params: Dict[str, List[str]]) -> str:
+    """
+    Compute the X-Twilio-Signature Twilio sends with a form-encoded webhook
+    
+    Args:
+        signing_key: The Twilio auth token, already encoded to bytes
+        url: The full public URL Twilio requested (including any query string)
+        params: POST parameters as name -> list of values
+        
+    Returns:
+        Base64-encoded HMAC-SHA1 of the URL followed by each sorted name/value pair
+    """
+    parts = [url]
+    for name in sorted(params):
+        for value in sorted(set(params[name])):
+            parts.append(name)
+            parts.append(value)
+    digest = hmac.new(signing_key, ''.join(parts).encode('utf-8'), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+def is_valid_twilio_signature(signing_key: bytes, url: str, params: Dict[str, List[str]], signature: str) -> bool:
+    """
+    Check a webhook's X-Twilio-Signature header in constant time
+    
+    Args:
+        signing_key: The Twilio auth token, already encoded to bytes
+        url: The full public URL Twilio requested (including any query string)
+        params: POST parameters as name -> list of values
+        signature: Value of the X-Twilio-Signature header
+        
+    Returns:
+        True if the signature matches
+    """
+    if not signing_key or not signature:
+        return False
+    return hmac.compare_digest(compute_twilio_signature(signing_key, url, params), signature)
+
 def validate_retell_inbound_webhook(data: Dict[str, Any]) -> None:
     """
     Validate Retell webhook data (supports both call_inbound and call_started events)
@@ -18,19 +83,20 @@ def validate_retell_inbound_webhook(data: Dict[str, Any]) -> None:
         raise ValueError("Data must be a dictionary")
     
     # Check required top-level fields
-    if 'event' not in data:
+    event = data.get('event')
+    if event is None:
         raise ValueError("Missing required field: event")
     
     # Accept all Retell call lifecycle events
-    if data['event'] not in ['call_inbound', 'call_started', 'call_ended', 'call_analyzed']:
+    if event not in RETELL_EVENTS:
         raise ValueError("Event must be 'call_inbound', 'call_started', 'call_ended', or 'call_analyzed'")
     
     # Handle different payload structures
-    if data['event'] == 'call_inbound':
+    if event == 'call_inbound':
         if 'call_inbound' not in data:
             raise ValueError("Missing required field: call_inbound")
         inbound_data = data['call_inbound']
-    elif data['event'] in ['call_started', 'call_ended', 'call_analyzed']:
+    else:
         if 'call' not in data:
             raise ValueError("Missing required field: call")
         inbound_data = data['call']
@@ -50,7 +116,7 @@ def validate_retell_inbound_webhook(data: Dict[str, Any]) -> None:
                 raise ValueError(f"{field} must start with '+'")
             
             # Basic phone number format validation (at least 7 digits)
-            digits_only = re.sub(r'[^\d]', '', phone_number)
+            digits_only = _NON_DIGIT_RE.sub('', phone_number)
             if len(digits_only) < 7:
                 raise ValueError(f"{field} must contain at least 7 digits")
     